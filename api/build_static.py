@@ -0,0 +1,161 @@
+"""
+Prebuilt static artifacts served by nginx instead of FastAPI.
+
+    python -m api.build_static [--out static] [--databases legacy 2015 ...] [--no-pars]
+
+Renders, for every station database, the state code list, the stations of
+each state, the station GeoJSON and the raw station par files, plus the
+WEPP:Road management files. Every file is written with a ``.gz`` sibling
+for nginx ``gzip_static``.
+
+A build goes to ``<out>/<version>/`` where the version is a digest of its
+contents, so the paths never change and can be served with ``expires``.
+``<out>/current`` is a symlink to the latest build; the rockclim GET routes
+redirect to (or, without ``FSWEPP2_STATIC_URL``, serve) its files and the
+WEPP:Road management route serves its management files.
+"""
+import os
+from os.path import join as _join
+from os.path import exists as _exists
+
+import gzip
+import json
+import shutil
+import hashlib
+import argparse
+
+from fastapi.encoders import jsonable_encoder
+
+_thisdir = os.path.dirname(os.path.abspath(__file__))
+
+static_dir = os.path.abspath(_join(_thisdir, '..', 'static'))
+
+# public URL of static_dir, e.g. https://fswepp2.bearhive.duckdns.org/static
+static_url = os.environ.get('FSWEPP2_STATIC_URL')
+
+
+def _json_bytes(obj) -> bytes:
+    # same serialization as http_cache.cached_json_response
+    return json.dumps(jsonable_encoder(obj), separators=(',', ':')).encode('utf-8')
+
+
+def current_version(root: str = static_dir):
+    link = _join(root, 'current')
+    if not os.path.islink(link):
+        return None
+    return os.readlink(link)
+
+
+def static_path(relpath: str, root: str = static_dir):
+    """
+    Path of ``relpath`` in the current build, None if it was not built.
+    """
+    version = current_version(root)
+    if version is None:
+        return None
+
+    path = _join(root, version, relpath)
+    if _exists(path):
+        return path
+    return None
+
+
+class _Build:
+    def __init__(self, build_dir: str):
+        self.build_dir = build_dir
+        self.files = {}
+
+    def write(self, relpath: str, content: bytes):
+        path = _join(self.build_dir, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as fp:
+            fp.write(content)
+        with gzip.open(path + '.gz', 'wb', compresslevel=9) as fp:
+            fp.write(content)
+        self.files[relpath] = hashlib.sha256(content).hexdigest()
+
+    def copy(self, relpath: str, src_fn: str):
+        with open(src_fn, 'rb') as fp:
+            self.write(relpath, fp.read())
+
+    def version(self) -> str:
+        h = hashlib.sha256()
+        for relpath in sorted(self.files):
+            h.update(f'{relpath}\0{self.files[relpath]}\n'.encode('utf-8'))
+        return h.hexdigest()[:16]
+
+
+def build_rockclim(build: _Build, database: str, pars: bool = True):
+    from .station_registry import get_registry
+
+    registry = get_registry(database)
+
+    states = {k: registry.states[k] for k in sorted(registry.states)}
+    build.write(f'rockclim/{database}/states.json', _json_bytes(states))
+
+    for state_code in sorted(set(str(s) for s in registry.state_codes)):
+        build.write(f'rockclim/{database}/stations_in_state/{state_code}.json',
+                    _json_bytes(registry.as_dicts(registry.in_state(state_code))))
+
+    build.write(f'rockclim/{database}/stations.geojson',
+                _json_bytes(registry.to_geojson(range(len(registry)))))
+
+    if pars:
+        for par_id, par_path in zip(registry.ids, registry.par_paths):
+            build.copy(f'rockclim/{database}/par/{par_id}.par', str(par_path))
+
+
+def build_wepproad(build: _Build):
+    # soils are rewritten for every road, only the managements are served as is
+    src_dir = _join(_thisdir, 'db/wepproad/managements')
+    for fn in sorted(os.listdir(src_dir)):
+        if os.path.isfile(_join(src_dir, fn)):
+            build.copy(f'wepproad/managements/{fn}', _join(src_dir, fn))
+
+
+def build_static(out_dir: str = static_dir, databases=None, pars: bool = True) -> str:
+    """
+    Render every artifact into a new versioned directory and point
+    ``<out_dir>/current`` at it. Returns the version.
+    """
+    from .station_registry import databases as all_databases
+
+    os.makedirs(out_dir, exist_ok=True)
+    build_dir = _join(out_dir, f'.build_{os.getpid()}')
+    shutil.rmtree(build_dir, ignore_errors=True)
+
+    try:
+        build = _Build(build_dir)
+        for database in databases or all_databases:
+            build_rockclim(build, database, pars)
+        build_wepproad(build)
+
+        version = build.version()
+        with open(_join(build_dir, 'manifest.json'), 'w') as fp:
+            json.dump({'version': version, 'files': build.files}, fp, indent=2)
+
+        if _exists(_join(out_dir, version)):
+            shutil.rmtree(build_dir)
+        else:
+            os.replace(build_dir, _join(out_dir, version))
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+    tmp_link = _join(out_dir, f'.current_{os.getpid()}')
+    if os.path.islink(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(version, tmp_link)
+    os.replace(tmp_link, _join(out_dir, 'current'))
+
+    return version
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the static artifacts served by nginx')
+    parser.add_argument('--out', default=static_dir)
+    parser.add_argument('--databases', nargs='+', default=None)
+    parser.add_argument('--no-pars', action='store_true', help='skip the station par files')
+    args = parser.parse_args()
+
+    version = build_static(args.out, args.databases, pars=not args.no_pars)
+    print(f'static artifacts {version} -> {_join(args.out, version)}')
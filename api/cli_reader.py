@@ -0,0 +1,152 @@
+import os
+from os.path import exists as _exists
+
+import io
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+DAILY_COLUMNS = (
+    'da', 'mo', 'year', 'prcp', 'dur', 'tp', 'ip',
+    'tmax', 'tmin', 'rad', 'w-vl', 'w-dir', 'tdew'
+)
+
+_number_re = re.compile(rb'-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?')
+
+
+def daily_path(cli_fn: str) -> str:
+    return os.path.splitext(cli_fn)[0] + '.daily.npy'
+
+
+def _split_header(contents: bytes):
+    """
+    Split a CLIGEN climate into its header (through the units line that
+    follows the ``da mo year ...`` column line) and the daily block.
+    """
+    i = contents.find(b'da mo year')
+    if i == -1:
+        raise ValueError('Daily column header not found, not a CLIGEN climate file')
+
+    j = contents.index(b'\n', i)
+    k = contents.find(b'\n', j + 1)
+    if k == -1:
+        return contents, b''
+    return contents[:k + 1], contents[k + 1:]
+
+
+def _is_daily_table(values: np.ndarray) -> bool:
+    if values.size % len(DAILY_COLUMNS) != 0:
+        return False
+
+    table = values.reshape(-1, len(DAILY_COLUMNS))
+    if len(table) == 0:
+        return True
+
+    da, mo, year = table[:, 0], table[:, 1], table[:, 2]
+    return bool(np.all((da >= 1) & (da <= 31)) and
+                np.all((mo >= 1) & (mo <= 12)) and
+                np.all(np.diff(year) >= 0))
+
+
+def parse_daily_block(block: bytes) -> np.ndarray:
+    """
+    Parse the daily block of a CLIGEN climate into an (n_days, 13) array.
+
+    The fast path hands the whole block to NumPy's C text reader. Fixed-width
+    fields can run together (e.g. ``-10.2-12.4`` on very cold days); when
+    that happens the block is re-tokenized with a regular expression.
+    """
+    if not block.strip():
+        return np.zeros((0, len(DAILY_COLUMNS)))
+
+    try:
+        values = np.loadtxt(io.BytesIO(block), dtype=np.float64, ndmin=2)
+    except ValueError:
+        values = np.zeros(1)
+
+    if not _is_daily_table(values):
+        values = np.array(_number_re.findall(block), dtype=np.float64)
+        if not _is_daily_table(values):
+            raise ValueError('Could not parse the daily block of the climate file')
+
+    return values.reshape(-1, len(DAILY_COLUMNS))
+
+
+def read_cli_header(cli_fn: str) -> str:
+    header = []
+    with open(cli_fn) as fp:
+        for line in fp:
+            header.append(line)
+            if 'da mo year' in line:
+                header.append(fp.readline())
+                break
+    return ''.join(header)
+
+
+class CliDaily:
+    """
+    Daily values of a CLIGEN climate as a (n_days, 13) float array.
+
+    Columns are accessed by their CLIGEN names, e.g. ``daily['prcp']``.
+    """
+    def __init__(self, data: np.ndarray, header: str = None):
+        self.data = data
+        self.header = header
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.data[:, DAILY_COLUMNS.index(column)]
+
+    @property
+    def years(self) -> np.ndarray:
+        return np.unique(self['year']).astype(np.int64)
+
+    def as_dataframe(self) -> pd.DataFrame:
+        df = pd.DataFrame(np.asarray(self.data), columns=DAILY_COLUMNS)
+        for column in ('da', 'mo', 'year'):
+            df[column] = df[column].astype(np.int64)
+        return df
+
+
+def write_daily_cache(cli_fn: str, data: np.ndarray, out_cli_fn: str = None):
+    if out_cli_fn is None:
+        out_cli_fn = cli_fn
+
+    npy_fn = daily_path(out_cli_fn)
+    tmp_fn = f'{npy_fn}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_fn, 'wb') as fp:
+        np.save(fp, np.ascontiguousarray(data, dtype=np.float64))
+    os.replace(tmp_fn, npy_fn)
+
+
+def read_cli(cli_fn: str, use_cache: bool = True) -> CliDaily:
+    """
+    Read the daily block of a CLIGEN climate.
+
+    With ``use_cache`` the parsed table is saved next to the climate as
+    ``.daily.npy`` and later reads memory-map it instead of parsing text.
+    The cache is ignored when it is older than the climate.
+    """
+    npy_fn = daily_path(cli_fn)
+
+    if use_cache and _exists(npy_fn) and \
+            os.path.getmtime(npy_fn) >= os.path.getmtime(cli_fn):
+        return CliDaily(np.load(npy_fn, mmap_mode='r'), read_cli_header(cli_fn))
+
+    with open(cli_fn, 'rb') as fp:
+        contents = fp.read()
+
+    header, block = _split_header(contents)
+    data = parse_daily_block(block)
+
+    if use_cache:
+        try:
+            write_daily_cache(cli_fn, data)
+        except OSError:
+            pass
+
+    return CliDaily(data, header.decode('utf-8', errors='replace'))
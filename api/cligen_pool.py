@@ -0,0 +1,191 @@
+import os
+from os.path import join as _join
+
+import time
+import fcntl
+import queue
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+# priorities, lower runs first
+INTERACTIVE = 0
+BATCH = 1
+PREWARM = 2
+
+priority_names = {INTERACTIVE: 'interactive', BATCH: 'batch', PREWARM: 'prewarm'}
+
+# number of recent jobs the latency percentiles are computed over
+METRICS_WINDOW = 1000
+
+# flock slot files shared by all the processes on the host
+slot_dir = '/ramdisk/rockclim/cligen_slots'
+
+# seconds between attempts to take a host slot
+SLOT_POLL = 0.05
+
+
+def _latency(values) -> dict:
+    if len(values) == 0:
+        return {'mean': None, 'p50': None, 'p95': None, 'max': None}
+
+    values = np.asarray(values, dtype=np.float64)
+    return {
+        'mean': float(values.mean()),
+        'p50': float(np.percentile(values, 50)),
+        'p95': float(np.percentile(values, 95)),
+        'max': float(values.max())
+    }
+
+
+class CligenPool:
+    """
+    Bounded executor for cligen runs.
+
+    A fixed number of worker threads (one per core by default, or
+    ``CLIGEN_WORKERS``) take jobs from a priority queue, so at most that many
+    cligen processes run at once and interactive requests are served before
+    batch and prewarm work. Jobs of equal priority run in submission order.
+
+    The worker count is per process. Each run also holds one of
+    ``host_slots`` flock slot files in ``slot_dir`` (one per core by default,
+    or ``CLIGEN_HOST_SLOTS``), which bounds the cligen processes of all the
+    uvicorn workers on the host together. Without a writable ``slot_dir``
+    only the per process bound applies.
+
+    Queue wait, including the wait for a host slot, and run time are
+    recorded per priority for ``stats()``.
+    """
+    def __init__(self, workers: int = None, host_slots: int = None):
+        if workers is None:
+            workers = int(os.environ.get('CLIGEN_WORKERS', 0)) or os.cpu_count() or 1
+        if host_slots is None:
+            host_slots = int(os.environ.get('CLIGEN_HOST_SLOTS', 0)) or os.cpu_count() or 1
+        self.workers = workers
+        self.host_slots = host_slots
+
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._running = 0
+
+        self._submitted = {p: 0 for p in priority_names}
+        self._completed = {p: 0 for p in priority_names}
+        self._failed = {p: 0 for p in priority_names}
+        self._waits = {p: deque(maxlen=METRICS_WINDOW) for p in priority_names}
+        self._runs = {p: deque(maxlen=METRICS_WINDOW) for p in priority_names}
+
+    def _start(self):
+        # workers are started on first use so importing the module is free
+        if len(self._threads) == self.workers:
+            return
+
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._worker, daemon=True,
+                                          name=f'cligen-{len(self._threads)}')
+                thread.start()
+                self._threads.append(thread)
+
+    def _host_slot(self):
+        """
+        Lock one of the host slot files, waiting until one is free. Returns
+        the open slot file, or None when ``slot_dir`` is not usable.
+        """
+        try:
+            os.makedirs(slot_dir, exist_ok=True)
+            fps = [open(_join(slot_dir, f'slot.{i}'), 'a') for i in range(self.host_slots)]
+        except OSError:
+            return None
+
+        while True:
+            for fp in fps:
+                try:
+                    fcntl.flock(fp, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                for other in fps:
+                    if other is not fp:
+                        other.close()
+                return fp
+            time.sleep(SLOT_POLL)
+
+    def _worker(self):
+        while True:
+            priority, _, enqueued, future, func, args, kwargs = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            slot = self._host_slot()
+            started = time.perf_counter()
+            with self._lock:
+                self._running += 1
+                self._waits[priority].append(started - enqueued)
+
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+                failed = True
+            else:
+                future.set_result(result)
+                failed = False
+            finally:
+                if slot is not None:
+                    # closing the file releases its lock
+                    slot.close()
+
+            with self._lock:
+                self._running -= 1
+                self._runs[priority].append(time.perf_counter() - started)
+                if failed:
+                    self._failed[priority] += 1
+                else:
+                    self._completed[priority] += 1
+
+    def submit(self, priority: int, func, *args, **kwargs) -> Future:
+        if priority not in priority_names:
+            raise ValueError(f'Invalid priority {priority}')
+
+        self._start()
+
+        future = Future()
+        with self._lock:
+            self._submitted[priority] += 1
+        self._queue.put((priority, next(self._seq), time.perf_counter(),
+                         future, func, args, kwargs))
+        return future
+
+    def run(self, priority: int, func, *args, **kwargs):
+        """
+        Run ``func`` on the pool and wait for its result.
+        """
+        return self.submit(priority, func, *args, **kwargs).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            priorities = {}
+            for p, name in priority_names.items():
+                priorities[name] = {
+                    'submitted': self._submitted[p],
+                    'completed': self._completed[p],
+                    'failed': self._failed[p],
+                    'queue_wait_s': _latency(self._waits[p]),
+                    'run_time_s': _latency(self._runs[p]),
+                }
+
+            return {
+                'pid': os.getpid(),
+                'workers': self.workers,
+                'host_slots': self.host_slots,
+                'running': self._running,
+                'queued': self._queue.qsize(),
+                'priorities': priorities,
+            }
+
+
+cligen_pool = CligenPool()
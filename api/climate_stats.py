@@ -0,0 +1,194 @@
+import os
+from os.path import exists as _exists
+
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .cli_reader import read_cli
+
+# bump when the sidecar contents change so stale sidecars are recomputed
+STATS_VERSION = 2
+
+# share of the annual precipitation falling in July through September
+# above which a climate is monsoonal
+MONSOON_SHARE = 0.3
+
+PEAK_INTENSITY_COLUMNS = [
+    '10-min Peak Rainfall Intensity (mm/hour)',
+    '30-min Peak Rainfall Intensity (mm/hour)',
+    '60-min Peak Rainfall Intensity (mm/hour)',
+]
+
+
+def _json_default(obj):
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, 'item'):
+        return obj.item()
+    return str(obj)
+
+
+def _tmp_path(fn: str) -> str:
+    return f'{fn}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+
+def stats_path(cli_fn: str) -> str:
+    return os.path.splitext(cli_fn)[0] + '.stats.json'
+
+
+def peaks_path(cli_fn: str) -> str:
+    return os.path.splitext(cli_fn)[0] + '.peaks.npz'
+
+
+def calc_monthlies(data: np.ndarray) -> dict:
+    """
+    Monthlies of a (n_days, 13) CLIGEN daily table, with the keys of the
+    station par monthlies: mean monthly precipitation (mm) and number of
+    wet days, mean daily max and min temperature (C), mean daily solar
+    radiation (langleys/day) and dew point (C).
+    """
+    mo = data[:, 1].astype(np.int64) - 1
+    n_years = max(len(np.unique(data[:, 2])), 1)
+    days = np.maximum(np.bincount(mo, minlength=12), 1)
+
+    def _mean_daily(column):
+        return (np.bincount(mo, weights=data[:, column], minlength=12) / days).tolist()
+
+    prcp = data[:, 3]
+    return {
+        'ppts': (np.bincount(mo, weights=prcp, minlength=12) / n_years).tolist(),
+        'nwds': (np.bincount(mo, weights=prcp > 0.0, minlength=12) / n_years).tolist(),
+        'tmaxs': _mean_daily(7),
+        'tmins': _mean_daily(8),
+        'rads': _mean_daily(9),
+        'tdews': _mean_daily(12),
+    }
+
+
+def is_monsoonal(monthlies: dict) -> bool:
+    ppts = monthlies['ppts']
+    total = sum(ppts)
+    return total > 0.0 and sum(ppts[6:9]) / total > MONSOON_SHARE
+
+
+def _peak_ratio_exponent(ip: np.ndarray) -> np.ndarray:
+    """
+    Exponent u of the double exponential storm with peak to average
+    intensity ratio ``ip``: (1 - exp(-u)) / u = 1 / ip, solved by bisection.
+    """
+    ip = np.maximum(ip, 1.0)
+    lo, hi = np.zeros_like(ip), ip + 1.0
+    for _ in range(60):
+        u = (lo + hi) / 2.0
+        too_peaked = -np.expm1(-u) / u < 1.0 / ip
+        hi = np.where(too_peaked, u, hi)
+        lo = np.where(too_peaked, lo, u)
+    return (lo + hi) / 2.0
+
+
+def calc_peak_intensities(data: np.ndarray, windows_min=(10, 30, 60)) -> np.ndarray:
+    """
+    Daily peak rainfall intensities (mm/hour) over ``windows_min`` minute
+    windows, as (n_days, len(windows_min)).
+
+    Storms follow WEPP's double exponential disaggregation: intensity rises
+    to ``ip`` times the storm average at ``tp`` of the duration and falls
+    off with equal intensities at both ends. The window of largest depth
+    is centered on the peak in proportion to ``tp``, and a fraction s of the
+    duration around the peak holds ip (1 - exp(-u s)) / u of the depth.
+    """
+    prcp, dur, ip = data[:, 3], data[:, 4], data[:, 6]
+    wet = (prcp > 0.0) & (dur > 0.0)
+
+    u = _peak_ratio_exponent(ip[wet])
+    ratio = np.maximum(ip[wet], 1.0)
+
+    peaks = np.zeros((len(data), len(windows_min)))
+    for j, window_min in enumerate(windows_min):
+        window_h = window_min / 60.0
+        s = np.minimum(window_h / dur[wet], 1.0)
+        depth_fraction = np.where(u > 1e-9, -ratio * np.expm1(-u * s) / np.maximum(u, 1e-9), s)
+        peaks[wet, j] = prcp[wet] * np.minimum(depth_fraction, 1.0) / window_h
+    return peaks
+
+
+def write_climate_stats(cli_fn: str, out_cli_fn: str = None) -> dict:
+    """
+    Compute the statistics of ``cli_fn`` and write the sidecars of ``out_cli_fn``.
+
+    Two sidecars are written: ``.stats.json`` with the monthlies and the
+    monsoonal flag, and ``.peaks.npz`` with the daily 10/30/60-minute peak
+    rainfall intensities. ``out_cli_fn`` defaults to ``cli_fn``; the climate
+    store uses it to compute stats on a climate before moving it into place.
+    """
+    if out_cli_fn is None:
+        out_cli_fn = cli_fn
+
+    data = np.asarray(read_cli(cli_fn, use_cache=False).data)
+    monthlies = calc_monthlies(data)
+    stats = {
+        'version': STATS_VERSION,
+        'monthlies': monthlies,
+        'is_monsoonal': is_monsoonal(monthlies),
+    }
+
+    stats_fn = stats_path(out_cli_fn)
+    tmp_fn = _tmp_path(stats_fn)
+    with open(tmp_fn, 'w') as fp:
+        json.dump(stats, fp, default=_json_default)
+    os.replace(tmp_fn, stats_fn)
+
+    peaks_fn = peaks_path(out_cli_fn)
+    tmp_fn = _tmp_path(peaks_fn)
+    with open(tmp_fn, 'wb') as fp:
+        np.savez(fp,
+                 version=np.array(STATS_VERSION),
+                 da=data[:, 0].astype(np.int16),
+                 mo=data[:, 1].astype(np.int16),
+                 year=data[:, 2].astype(np.int32),
+                 peaks=calc_peak_intensities(data))
+    os.replace(tmp_fn, peaks_fn)
+
+    return json.loads(json.dumps(stats, default=_json_default))
+
+
+def load_climate_stats(cli_fn: str) -> dict:
+    """
+    Monthlies and monsoonal flag of a climate, computed on first use.
+    """
+    stats_fn = stats_path(cli_fn)
+    if _exists(stats_fn):
+        with open(stats_fn) as fp:
+            stats = json.load(fp)
+        if stats.get('version') == STATS_VERSION:
+            return stats
+
+    return write_climate_stats(cli_fn)
+
+
+def load_peak_intensities(cli_fn: str) -> pd.DataFrame:
+    """
+    Daily peak rainfall intensities (see ``calc_peak_intensities``) with
+    the columns of ``ClimateFile.as_dataframe(calc_peak_intensities=True)``.
+    """
+    peaks_fn = peaks_path(cli_fn)
+    if not _exists(peaks_fn):
+        write_climate_stats(cli_fn)
+
+    with np.load(peaks_fn) as data:
+        stale = int(data['version']) != STATS_VERSION
+        if not stale:
+            df = pd.DataFrame({'da': data['da'].astype(np.int64),
+                               'mo': data['mo'].astype(np.int64),
+                               'year': data['year'].astype(np.int64)})
+            for i, column in enumerate(PEAK_INTENSITY_COLUMNS):
+                df[column] = data['peaks'][:, i]
+
+    if stale:
+        write_climate_stats(cli_fn)
+        return load_peak_intensities(cli_fn)
+
+    return df
@@ -0,0 +1,427 @@
+import os
+from os.path import join as _join
+from os.path import exists as _exists
+
+import re
+import json
+import time
+import fcntl
+import shutil
+import hashlib
+import tempfile
+import threading
+
+import numpy as np
+
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from wepppy2.climates.cligen import Cligen
+
+from .climate_stats import write_climate_stats
+from .cli_reader import read_cli, _split_header
+from .cligen_pool import cligen_pool, INTERACTIVE, BATCH
+
+store_dir = '/ramdisk/rockclim/store'
+
+# lengths used to check that a short climate is a prefix of a longer one
+PREFIX_CHECK_YEARS = (2, 4)
+
+# cligen seed of the prefix check for seeded realizations
+PREFIX_CHECK_SEED = 1
+
+# <years>y.cli for the default realization, <years>y.s<seed>.cli for seeded ones
+_cli_name_re = re.compile(r'^(\d+)y(?:\.s(\d+))?\.cli$')
+
+_sidecar_exts = ('.stats.json', '.peaks.npz', '.daily.npy')
+
+
+def station_digest(station, cligen_version: str) -> str:
+    """
+    Stable digest of the effective station parameters and cligen version.
+
+    Unlike ``hash()`` this is identical across worker processes and restarts,
+    so climates generated by one worker can be reused by every other worker.
+    """
+    contents = station.contents
+    if isinstance(contents, str):
+        contents = contents.encode('utf-8')
+
+    h = hashlib.sha256()
+    h.update(str(cligen_version).encode('utf-8'))
+    h.update(b'\0')
+    h.update(contents)
+    return h.hexdigest()
+
+
+@contextmanager
+def file_lock(lock_fn: str):
+    """
+    Exclusive advisory lock shared by every process on the host.
+    """
+    os.makedirs(os.path.dirname(lock_fn), exist_ok=True)
+    with open(lock_fn, 'a') as fp:
+        fcntl.flock(fp, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fp, fcntl.LOCK_UN)
+
+
+def _set_years_simulated(header: bytes, years: int) -> bytes:
+    """
+    Rewrite the ``Years simulated`` field and the ``-y`` command line flag
+    of a CLIGEN header.
+
+    Raises ``ValueError`` when the header does not have the layout of the
+    4.x and 5.x CLIGEN headers, the climate is then regenerated.
+    """
+    lines = header.split(b'\n')
+    for i, line in enumerate(lines[:-1]):
+        if b'Years simulated' not in line:
+            continue
+
+        def _years(m):
+            width = len(m.group(2)) + len(m.group(3))
+            return m.group(1) + str(years).rjust(width).encode() if len(str(years)) < width \
+                else m.group(1) + b' ' + str(years).encode()
+
+        values, n = re.subn(rb'^(\s*\S+\s+\S+\s+\S+\s+\S+\s+\S+)(\s+)(\d+)', _years, lines[i + 1], count=1)
+        if n != 1:
+            raise ValueError('unrecognized CLIGEN header: no years simulated value')
+        lines[i + 1] = re.sub(rb'-y\d+', b'-y%d' % years, values)
+        return b'\n'.join(lines)
+
+    raise ValueError('unrecognized CLIGEN header: no Years simulated line')
+
+
+def slice_climate(src_fn: str, years: int, dst_fn: str):
+    """
+    Write the first ``years`` years of the climate ``src_fn`` to ``dst_fn``.
+    """
+    with open(src_fn, 'rb') as fp:
+        header, block = _split_header(fp.read())
+
+    # longer climates are sliced repeatedly, their daily cache is kept
+    year_column = np.asarray(read_cli(src_fn)['year'])
+    simulated_years = np.unique(year_column)
+    if len(simulated_years) < years:
+        raise ValueError(f'{src_fn} has fewer than {years} years')
+
+    n_days = int(np.count_nonzero(year_column <= simulated_years[years - 1]))
+    lines = block.splitlines(keepends=True)
+
+    with open(dst_fn, 'wb') as fp:
+        fp.write(_set_years_simulated(header, years))
+        fp.write(b''.join(lines[:n_days]))
+
+
+def select_climate_years(src_fn: str, selected_years, dst_fn: str):
+    """
+    Write the days of ``selected_years`` of the climate ``src_fn`` to
+    ``dst_fn``, in the order of the file and with their year numbers.
+    """
+    with open(src_fn, 'rb') as fp:
+        header, block = _split_header(fp.read())
+
+    # ERMiT selects years from the same long climate on every run
+    year_column = np.asarray(read_cli(src_fn)['year'])
+    selected_years = np.unique(np.asarray(selected_years, dtype=np.int64))
+    keep = np.isin(year_column.astype(np.int64), selected_years)
+
+    lines = block.splitlines(keepends=True)[:len(year_column)]
+    with open(dst_fn, 'wb') as fp:
+        fp.write(_set_years_simulated(header, len(selected_years)))
+        fp.write(b''.join(line for line, k in zip(lines, keep) if k))
+
+
+class ClimateStore:
+    """
+    Content-addressed store of generated CLIGEN climates.
+
+    Climates live at ``<root>/<station_digest>/<years>y.cli``, additional
+    realizations generated with cligen seed ``s`` (ensembles) at
+    ``<years>y.s<s>.cli``. Files are
+    generated in a private temporary directory and moved into place with
+    ``os.replace`` so readers never observe a partially written climate.
+    The statistics sidecars (see ``climate_stats``) are written before the
+    climate is moved into place, so a stored climate always has them. The
+    columnar daily cache (see ``cli_reader``) is only read when slicing, it
+    is written on the first slice of a climate.
+
+    Concurrent requests for the same climate are coalesced: within a process
+    the first caller generates and the others wait on its future, across
+    processes generation is serialized with a per-climate file lock and the
+    store is re-checked once the lock is acquired.
+
+    Cligen runs go through the bounded ``cligen_pool``; callers pass the
+    priority of their request (interactive, batch or prewarm).
+
+    When a longer climate of the same series is already stored and the
+    cligen version is verified to generate prefix-consistent climates (see
+    ``prefix_safe``), a shorter climate is sliced from it instead of running
+    cligen.
+    """
+    def __init__(self, root: str = store_dir):
+        self.root = root
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.sliced = 0
+        self._prefix_safe = {}
+
+    def series_dir(self, digest: str) -> str:
+        return _join(self.root, digest)
+
+    def stem(self, digest: str, years: int, seed: int = None) -> str:
+        if seed:
+            return _join(self.series_dir(digest), f'{int(years)}y.s{int(seed)}')
+        return _join(self.series_dir(digest), f'{int(years)}y')
+
+    def path(self, digest: str, years: int, seed: int = None) -> str:
+        return self.stem(digest, years, seed) + '.cli'
+
+    def lock_path(self, digest: str, years: int, seed: int = None) -> str:
+        return self.stem(digest, years, seed) + '.lock'
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def lookup(self, digest: str, years: int, seed: int = None):
+        cli_fn = self.path(digest, years, seed)
+        if _exists(cli_fn):
+            return cli_fn
+        return None
+
+    def stored_years(self, digest: str, seed: int = None) -> list:
+        series_dir = self.series_dir(digest)
+        if not _exists(series_dir):
+            return []
+
+        years = []
+        for fn in os.listdir(series_dir):
+            m = _cli_name_re.match(fn)
+            if m and int(m.group(2) or 0) == int(seed or 0):
+                years.append(int(m.group(1)))
+        return sorted(years)
+
+    def _store(self, tmp_cli_fn: str, cli_fn: str):
+        # sidecars first so a stored climate always has them
+        write_climate_stats(tmp_cli_fn, cli_fn)
+        os.replace(tmp_cli_fn, cli_fn)
+
+    def generate(self, station, cligen_version: str, years: int, digest: str, seed: int = None,
+                 priority: int = INTERACTIVE) -> str:
+        cli_fn = self.path(digest, years, seed)
+        os.makedirs(self.series_dir(digest), exist_ok=True)
+
+        tmp_dir = tempfile.mkdtemp(prefix='.tmp_', dir=self.series_dir(digest))
+        try:
+            cligen = Cligen(station, tmp_dir, cliver=cligen_version)
+            if seed:
+                cligen_pool.run(priority, cligen.run_multiple_year, years, 
+                                cli_fname='wepp.cli', randseed=int(seed))
+            else:
+                cligen_pool.run(priority, cligen.run_multiple_year, years, cli_fname='wepp.cli')
+            self._store(_join(tmp_dir, 'wepp.cli'), cli_fn)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        return cli_fn
+
+    def slice(self, digest: str, years: int, src_years: int, seed: int = None) -> str:
+        cli_fn = self.path(digest, years, seed)
+
+        tmp_dir = tempfile.mkdtemp(prefix='.tmp_', dir=self.series_dir(digest))
+        try:
+            slice_climate(self.path(digest, src_years, seed), years, _join(tmp_dir, 'wepp.cli'))
+            self._store(_join(tmp_dir, 'wepp.cli'), cli_fn)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        return cli_fn
+
+    def prefix_safe_path(self, cligen_version: str, seeded: bool = False) -> str:
+        if seeded:
+            return _join(self.root, f'prefix_safe.{cligen_version}.seeded.json')
+        return _join(self.root, f'prefix_safe.{cligen_version}.json')
+
+    def prefix_safe(self, station, cligen_version: str, seeded: bool = False,
+                    priority: int = INTERACTIVE) -> bool:
+        """
+        True if ``cligen_version`` generates the first N years of an M year
+        climate identically to an N year climate.
+
+        Checked once per cligen version, and separately for seeded runs, by
+        generating two short climates and comparing their daily values. The
+        seeded check runs cligen with ``PREFIX_CHECK_SEED``. The result is
+        saved in the store root.
+        """
+        key = (cligen_version, bool(seeded))
+        safe = self._prefix_safe.get(key)
+        if safe is not None:
+            return safe
+
+        result_fn = self.prefix_safe_path(cligen_version, seeded)
+        with file_lock(result_fn + '.lock'):
+            if not _exists(result_fn):
+                short_years, long_years = PREFIX_CHECK_YEARS
+                tmp_dir = tempfile.mkdtemp(prefix='.tmp_', dir=self.root)
+                try:
+                    cligen = Cligen(station, tmp_dir, cliver=cligen_version)
+                    kwargs = dict(randseed=PREFIX_CHECK_SEED) if seeded else {}
+                    cligen_pool.run(priority, cligen.run_multiple_year, short_years,
+                                    cli_fname='short.cli', **kwargs)
+                    cligen_pool.run(priority, cligen.run_multiple_year, long_years,
+                                    cli_fname='long.cli', **kwargs)
+
+                    short = np.asarray(read_cli(_join(tmp_dir, 'short.cli'), use_cache=False).data)
+                    long = np.asarray(read_cli(_join(tmp_dir, 'long.cli'), use_cache=False).data)
+                    safe = bool(np.array_equal(short, long[:len(short)]))
+                finally:
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+                tmp_fn = f'{result_fn}.{os.getpid()}.{threading.get_ident()}.tmp'
+                with open(tmp_fn, 'w') as fp:
+                    json.dump({'cligen_version': cligen_version, 'seeded': bool(seeded), 'safe': safe,
+                               'years': PREFIX_CHECK_YEARS, 'checked': time.time()}, fp)
+                os.replace(tmp_fn, result_fn)
+
+            with open(result_fn) as fp:
+                safe = bool(json.load(fp)['safe'])
+
+        self._prefix_safe[key] = safe
+        return safe
+
+    def get_or_generate(self, station, cligen_version: str, years: int, seed: int = None,
+                        priority: int = INTERACTIVE) -> str:
+        digest = station_digest(station, cligen_version)
+
+        cli_fn = self.lookup(digest, years, seed)
+        if cli_fn is not None:
+            self._count('hits')
+            return cli_fn
+
+        key = (digest, int(years), int(seed or 0))
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if not leader:
+            self._count('coalesced')
+            return future.result()
+
+        try:
+            with file_lock(self.lock_path(digest, years, seed)):
+                cli_fn = self.lookup(digest, years, seed)
+                if cli_fn is not None:
+                    # generated by another worker while we waited on the lock
+                    self._count('coalesced')
+                else:
+                    longer = [n for n in self.stored_years(digest, seed) if n > years]
+                    if longer and self.prefix_safe(station, cligen_version, bool(seed), priority):
+                        try:
+                            cli_fn = self.slice(digest, years, longer[0], seed)
+                            self._count('sliced')
+                        except ValueError:
+                            # header we cannot rewrite, generate the climate instead
+                            cli_fn = None
+                    if cli_fn is None:
+                        self._count('misses')
+                        cli_fn = self.generate(station, cligen_version, years, digest, seed, priority)
+            future.set_result(cli_fn)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+        return cli_fn
+
+    def get_or_generate_ensemble(self, station, cligen_version: str, years: int, 
+                                 realizations: int, priority: int = BATCH) -> list:
+        """
+        Paths of ``realizations`` climates of the station. Realization 0 is
+        the default (unseeded) climate, realization k is generated with cligen
+        seed k. Each realization is cached on its own, so a larger ensemble
+        only generates the realizations that are missing. Missing realizations
+        are generated in parallel, bounded by the cligen pool; realization 0
+        keeps interactive priority, the others use ``priority``.
+        """
+        seeds = list(range(int(realizations)))
+        if len(seeds) == 1:
+            return [self.get_or_generate(station, cligen_version, years)]
+
+        def get(seed):
+            return self.get_or_generate(station, cligen_version, years, seed,
+                                        INTERACTIVE if seed == 0 else priority)
+
+        with ThreadPoolExecutor(max_workers=min(len(seeds), cligen_pool.workers)) as executor:
+            return list(executor.map(get, seeds))
+
+    def import_store(self, src_root: str) -> int:
+        """
+        Copy the climates of another store (e.g. a climate pack) that are
+        missing from this one. Sidecars are copied before the climate so an
+        imported climate is never visible without them.
+
+        Returns the number of climates imported.
+        """
+        imported = 0
+        for digest in sorted(os.listdir(src_root)):
+            src_dir = _join(src_root, digest)
+            if not os.path.isdir(src_dir):
+                continue
+
+            for fn in sorted(os.listdir(src_dir)):
+                m = _cli_name_re.match(fn)
+                if not m:
+                    continue
+
+                years, seed = int(m.group(1)), int(m.group(2) or 0)
+                if self.lookup(digest, years, seed) is not None:
+                    continue
+
+                with file_lock(self.lock_path(digest, years, seed)):
+                    if self.lookup(digest, years, seed) is not None:
+                        continue
+
+                    stem = fn[:-len('.cli')]
+                    sidecars = [stem + ext for ext in _sidecar_exts 
+                                if _exists(_join(src_dir, stem + ext))]
+
+                    for _fn in sidecars + [fn]:
+                        dst_fn = _join(self.series_dir(digest), _fn)
+                        shutil.copy2(_join(src_dir, _fn), dst_fn + '.tmp')
+                        os.replace(dst_fn + '.tmp', dst_fn)
+
+                imported += 1
+
+        return imported
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses, coalesced = self.hits, self.misses, self.coalesced
+            sliced = self.sliced
+            inflight = len(self._inflight)
+
+        total = hits + misses + coalesced + sliced
+        return {
+            'pid': os.getpid(),
+            'hits': hits,
+            'misses': misses,
+            'coalesced': coalesced,
+            'sliced': sliced,
+            'inflight': inflight,
+            'requests': total,
+            'hit_rate': (hits + coalesced + sliced) / total if total else None,
+        }
+
+
+climate_store = ClimateStore()
@@ -18,10 +18,11 @@ from fastapi import APIRouter, Query, Response, Request, HTTPException, Body
 from typing import Optional
 from pydantic import BaseModel
 
-from .rockclim import ClimatePars
+from .rockclim import ClimatePars, get_climates
 from .shared_models import SoilTexture
-from .wepp import parse_wepp_soil_output
-from .logger import log_run
+from .wepp import parse_wepp_soil_output, run_ensemble
+from .logger import log_run, log_climate
+from .http_cache import file_response
 
 router = APIRouter()
 
@@ -411,13 +412,12 @@ def create_slope_file(state: DisturbedWeppState) -> str:
     return slope_file
 
             
-def run_disturbedwepp(state: DisturbedWeppPars):
-    
-    import subprocess
-    from .rockclim import get_climate
-    
-    cwd = '/ramdisk/disturbed'
-    
+def create_input_files(state: DisturbedWeppState):
+    """
+    Writes the slope, soil and management files to the run directory and
+    returns their names. Ensemble runs share them, so they are written
+    once before the realizations start.
+    """
     slope_fn = create_slope_file(state)
     _slope_fn = _split(slope_fn)[1]
     
@@ -427,9 +427,26 @@ def run_disturbedwepp(state: DisturbedWeppPars):
     man_fn = create_management_file(state)
     _man_fn = _split(man_fn)[1]
     
-    cli_fn = get_climate(state.climate)
+    return _slope_fn, _soil_fn, _man_fn
+
+
+def run_disturbedwepp(state: DisturbedWeppPars, realization: int = 0, cli_fn: str = None, input_files=None):
+    
+    import subprocess
+    from .rockclim import get_climate
+    
+    cwd = '/ramdisk/disturbed'
+    
+    if input_files is None:
+        input_files = create_input_files(state)
+    _slope_fn, _soil_fn, _man_fn = input_files
+    
+    if cli_fn is None:
+        cli_fn = get_climate(state.climate, realization)
     
     _hash = hash(state)
+    if realization:
+        _hash = f'{_hash}.r{realization}'
     run_fn = _join(cwd, f'wd_{_hash}.run')
     output_fn = _join(cwd, f'wd_{_hash}.dat')
     _output_fn = _split(output_fn)[1]
@@ -523,7 +540,7 @@ example_pars = {
 }
     
 @router.post("/disturbed/GET/soil")
-def disturbed_get_soil(state: DisturbedWeppState = Body(
+def disturbed_get_soil(request: Request, state: DisturbedWeppState = Body(
         ...,
 
         example=example_pars
@@ -531,8 +548,7 @@ def disturbed_get_soil(state: DisturbedWeppState = Body(
 ):
     try:
         soil_file_path = create_soil_file(state)
-        contents = open(soil_file_path).read()
-        return Response(content=contents, media_type="application/text")
+        return file_response(request, soil_file_path)
     except ValueError as e:
         return {"error": str(e)}
     except FileNotFoundError as e:
@@ -540,15 +556,14 @@ def disturbed_get_soil(state: DisturbedWeppState = Body(
     
 
 @router.post("/disturbed/GET/management")
-def disturbed_get_management(state: DisturbedWeppState = Body(
+def disturbed_get_management(request: Request, state: DisturbedWeppState = Body(
         ...,
         example=example_pars
     )
 ):
     try:
         man_file_path = create_management_file(state)
-        contents = open(man_file_path).read()
-        return Response(content=contents, media_type="application/text")
+        return file_response(request, man_file_path)
     except ValueError as e:
         return {"error": str(e)}
     except FileNotFoundError as e:
@@ -556,15 +571,14 @@ def disturbed_get_management(state: DisturbedWeppState = Body(
     
 
 @router.post("/disturbed/GET/slope")
-def disturbed_get_slope(state: DisturbedWeppState = Body(
+def disturbed_get_slope(request: Request, state: DisturbedWeppState = Body(
         ...,
         example=example_pars
     )
 ):
     try:
         slope_file = create_slope_file(state)
-        contents = open(slope_file).read()
-        return Response(content=contents, media_type="application/text")
+        return file_response(request, slope_file)
     except ValueError as e:
         return {"error": str(e)}
     except FileNotFoundError as e:
@@ -579,21 +593,31 @@ def disturbed_run_wepp(
         example=example_pars
     )
 ):
-    output_fn = run_disturbedwepp(state)
-    log_run(ip=request.client.host, model="disturbed")
     slope_length = state.disturbedwepp_pars.upper_ofe.length_m + state.disturbedwepp_pars.lower_ofe.length_m
-    return parse_wepp_soil_output(output_fn, slope_length=slope_length)
+    
+    if state.climate.ensemble > 1:
+        input_files = create_input_files(state)
+        results = run_ensemble(
+            lambda realization, cli_fn: run_disturbedwepp(state, realization, cli_fn, input_files),
+            lambda output_fn: parse_wepp_soil_output(output_fn, slope_length=slope_length),
+            get_climates(state.climate))
+    else:
+        output_fn = run_disturbedwepp(state)
+        results = parse_wepp_soil_output(output_fn, slope_length=slope_length)
+    
+    log_run(ip=request.client.host, model="disturbed")
+    log_climate(model="disturbed", climate=state.climate)
+    return results
 
 
 @router.post("/disturbedwepp/GET/wepp_output")
-def disturbed_get_wepp_output(state: DisturbedWeppState = Body(
+def disturbed_get_wepp_output(request: Request, state: DisturbedWeppState = Body(
         ...,
         example=example_pars
     )
 ):
     output_fn = run_disturbedwepp(state)
-    contents = open(output_fn).read()
-    return Response(content=contents, media_type="application/text")
+    return file_response(request, output_fn)
     
 
 
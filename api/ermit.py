@@ -23,12 +23,13 @@ from fastapi.responses import JSONResponse
 from typing import Optional
 from pydantic import BaseModel, ValidationError, field_validator
 
-from wepppy2.climates.cligen import ClimateFile
-
 from .rockclim import ClimatePars, get_climate
+from .climate_store import select_climate_years
+from .climate_stats import load_climate_stats
 from .shared_models import SoilTexture
-from .wepp import parse_wepp_soil_output, get_annual_maxima_events_from_ebe, get_selected_events_from_ebe
-from .logger import log_run
+from .wepp import parse_wepp_soil_output, get_annual_maxima_events_from_ebe, get_selected_events_from_ebe, records
+from .logger import log_run, log_climate
+from .http_cache import file_response
 
 import wepppy2
 wepp_bin_dir = _join(os.path.dirname(wepppy2.__file__), 'wepp_runner/bin')
@@ -275,6 +276,7 @@ def get_probabilities(severity_class: BurnSeverity, is_moonsoonal: bool, spatial
     
     Parameters:
     severity_class (str): The severity class (e.g., 'h', 'm', 'l', 'u').
+    sed_results (dict): Columns of the selected events, sorted by sediment delivery.
     
     Returns:
     dict: A dictionary containing the probabilities.
@@ -383,13 +385,10 @@ def get_probabilities(severity_class: BurnSeverity, is_moonsoonal: bool, spatial
         for yr_after in range(5):
             cum_probabilities[treatment].append([0.01])
             
-    sed_deliveries = []
-    for event in sed_results:
-        k = event['k']
-        spatial_severity = event['spatial_severity']
-        year = event['year']
-        sed_delivery = event['sed_del_kg_m2']
-        sed_deliveries.append(sed_delivery)
+    sed_deliveries = sed_results['sed_del_kg_m2'].tolist()
+    for k, spatial_severity, year, sed_delivery in zip(
+            sed_results['k'].tolist(), sed_results['spatial_severity'].tolist(),
+            sed_results['year'].tolist(), sed_deliveries):
         
         _prob_climate = float(prob_climate[selected_years.index(year)])
                               
@@ -632,14 +631,14 @@ def run_ermitwepp_short_climate(state: ErmitState, spatial_severity: str, k: int
         raise Exception(open(stout_fn, 'r').read())
         return {"error": "WEPP run was not successful"}
 
-    d = get_selected_events_from_ebe(ebe_fn, selected_dates)
+    events = get_selected_events_from_ebe(ebe_fn, selected_dates)
     
-    for i in range(len(d)):
-        d[i]['spatial_severity'] = spatial_severity
-        d[i]['k'] = k
-        d[i]['sed_del_kg_m2'] = d[i]['sed_del_kg_m'] / state.ermit_pars.length_m
+    n = len(events['year'])
+    events['spatial_severity'] = np.full(n, spatial_severity)
+    events['k'] = np.full(n, k, dtype=np.int64)
+    events['sed_del_kg_m2'] = events['sed_del_kg_m'] / state.ermit_pars.length_m
         
-    return d
+    return events
 
 
 def run_ermitwepp(state: ErmitState):
@@ -735,7 +734,8 @@ def run_ermitwepp(state: ErmitState):
         raise Exception(open(stout_fn, 'r').read())
         return {"error": "WEPP run was not successful"}
 
-    largest_runoff_events = get_annual_maxima_events_from_ebe(ebe_fn)
+    # read again below with the peak intensities, the first read caches the events
+    largest_runoff_events = get_annual_maxima_events_from_ebe(ebe_fn, use_cache=True)
     runoff_year_ranks_descending = largest_runoff_events['runoff_year_ranks_descending']
     
     selected_ranks = [ 5, 10, 20, 50, 75 ]
@@ -745,12 +745,10 @@ def run_ermitwepp(state: ErmitState):
     selected_years = [ runoff_year_ranks_descending[i-1] for i in selected_ranks ]
     
     cli_fn = get_climate(state.climate)
-    climate = ClimateFile(cli_fn)
-    is_moonsoonal = climate.is_monsoonal
-    climate.selected_years_filter(selected_years)
-    
-    cli_truncated_fn = cli_fn.replace('.cli', '_.cli')
-    climate.write(cli_truncated_fn)
+    is_moonsoonal = load_climate_stats(cli_fn)['is_monsoonal']
+    # written next to the run files, climates in the store are shared and read-only
+    cli_truncated_fn = _join(cwd, f'e_{_hash}.selected.cli')
+    select_climate_years(cli_fn, selected_years, cli_truncated_fn)
     
     spatial_severities = get_spatial_severities(state.ermit_pars.burn_severity)
     
@@ -770,20 +768,24 @@ def run_ermitwepp(state: ErmitState):
             for spatial_severity in spatial_severities for k in range(5)
         ]
         for future in as_completed(futures):
-            sed_events = future.result()
-            sed_results.extend(sed_events)
+            sed_results.append(future.result())
 
-    # sort sed_results by sed_del_kg_m2 descending
-    sed_results = sorted(sed_results, key=lambda x: x['sed_del_kg_m2'], reverse=True)
+    sed_columns = {col: np.concatenate([events[col] for events in sed_results]) 
+                   for col in sed_results[0]}
+    
+    # sort by sed_del_kg_m2 descending, ties keep their order
+    order = np.argsort(-sed_columns['sed_del_kg_m2'], kind='stable')
+    sed_columns = {col: values[order] for col, values in sed_columns.items()}
+    sed_results = records(sed_columns)
     
     sed_results_fn = _join(cwd, f'e_{_hash}.sed.json')
     with open(sed_results_fn, 'w') as fp:
         json.dump(sed_results, fp, indent=2)
     
     with ThreadPoolExecutor() as executor:
-        future_probabilities = executor.submit(get_probabilities, state.ermit_pars.burn_severity, is_moonsoonal, spatial_severities, selected_years, sed_results)
+        future_probabilities = executor.submit(get_probabilities, state.ermit_pars.burn_severity, is_moonsoonal, spatial_severities, selected_years, sed_columns)
         future_summary = executor.submit(parse_wepp_soil_output, output_fn, return_period_measures = ['runoff_from_rain+snow_mm'])
-        future_ebe_events = executor.submit(get_annual_maxima_events_from_ebe, ebe_fn, cli_fn)
+        future_ebe_events = executor.submit(get_annual_maxima_events_from_ebe, ebe_fn, cli_fn, use_cache=True)
 
         probabilities, sed_deliviveries_kg_m2 = future_probabilities.result()
         summary = future_summary.result()
@@ -819,15 +821,14 @@ example_pars = {
 }
 
 @router.post("/ermit/GET/slope/{spatial_severity}")
-def ermit_get_slope(spatial_severity: str, state: ErmitState = Body(
+def ermit_get_slope(request: Request, spatial_severity: str, state: ErmitState = Body(
         ...,
         example=example_pars
     )
 ):
     try:
         slope_file = create_slope_file(spatial_severity, state)
-        contents = open(slope_file).read()
-        return Response(content=contents, media_type="application/text")
+        return file_response(request, slope_file)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except FileNotFoundError as e:
@@ -835,15 +836,14 @@ def ermit_get_slope(spatial_severity: str, state: ErmitState = Body(
     
     
 @router.post("/ermit/GET/soil/{spatial_severity}/{k}")
-def ermit_get_soil(spatial_severity: str, k:int, state: ErmitState = Body(
+def ermit_get_soil(request: Request, spatial_severity: str, k:int, state: ErmitState = Body(
         ...,
         example=example_pars
     )
 ):
     try:
         soil_file = create_soil_file(spatial_severity, k, state)
-        contents = open(soil_file).read()
-        return Response(content=contents, media_type="application/text")
+        return file_response(request, soil_file)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except FileNotFoundError as e:
@@ -851,15 +851,14 @@ def ermit_get_soil(spatial_severity: str, k:int, state: ErmitState = Body(
     
     
 @router.post("/ermit/GET/management/{spatial_severity}")
-def ermit_get_management(spatial_severity: str, state: ErmitState = Body(
+def ermit_get_management(request: Request, spatial_severity: str, state: ErmitState = Body(
         ...,
         example=example_pars
     )
 ):
     try:
         man_file_path = get_management_file(spatial_severity, state)
-        contents = open(man_file_path).read()
-        return Response(content=contents, media_type="application/text")
+        return file_response(request, man_file_path)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except FileNotFoundError as e:
@@ -890,4 +889,5 @@ def ermit_run_wepp(
 ):
     results = run_ermitwepp(state)
     log_run(ip=request.client.host, model="ermit")
+    log_climate(model="ermit", climate=state.climate)
     return JSONResponse(content=results)
@@ -0,0 +1,163 @@
+import os
+from os.path import exists as _exists
+
+import gzip
+import json
+import shutil
+import hashlib
+import threading
+from functools import lru_cache
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+from fastapi.encoders import jsonable_encoder
+
+# responses that only change when the station databases change
+LONG_MAX_AGE = 30 * 24 * 3600
+
+# smaller files are not worth compressing
+GZIP_MIN_SIZE = 1024
+
+# run directories and the climate store; files under these roots get a .gz
+# sibling written on first use, elsewhere (the repository data files) only
+# an existing sibling, e.g. from build_static, is served
+gzip_roots = ('/ramdisk/',)
+
+
+def strong_etag(content: bytes) -> str:
+    return '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    True if the ``If-None-Match`` header of the request matches ``etag``.
+    """
+    if_none_match = request.headers.get('if-none-match')
+    if not if_none_match:
+        return False
+
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*' or tag == etag or tag.removeprefix('W/') == etag:
+            return True
+    return False
+
+
+def cached_response(request: Request, content, media_type: str = 'application/json',
+                    max_age: int = LONG_MAX_AGE, etag: str = None) -> Response:
+    """
+    Response with a strong content-digest ``ETag`` and a public
+    ``Cache-Control`` lifetime. Answers a matching ``If-None-Match`` with an
+    empty 304 so caches can revalidate without downloading the body again.
+    """
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+
+    if etag is None:
+        etag = strong_etag(content)
+
+    headers = {
+        'ETag': etag,
+        'Cache-Control': f'public, max-age={max_age}'
+    }
+
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
+def cached_json_response(request: Request, obj, max_age: int = LONG_MAX_AGE) -> Response:
+    content = json.dumps(jsonable_encoder(obj), separators=(',', ':')).encode('utf-8')
+    return cached_response(request, content, 'application/json', max_age)
+
+
+@lru_cache(maxsize=8192)
+def _file_digest(path: str, mtime_ns: int, size: int) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_digest(path: str, st: os.stat_result = None) -> str:
+    """
+    sha256 of the file contents, computed once per (path, mtime, size).
+    """
+    if st is None:
+        st = os.stat(path)
+    return _file_digest(path, st.st_mtime_ns, st.st_size)
+
+
+def accepts_gzip(request: Request) -> bool:
+    for coding in request.headers.get('accept-encoding', '').split(','):
+        coding, _, params = coding.strip().partition(';')
+        if coding.strip() == 'gzip' and params.replace(' ', '') not in ('q=0', 'q=0.0'):
+            return True
+    return False
+
+
+def gzip_path(path: str, st: os.stat_result = None):
+    """
+    Precompressed ``<path>.gz`` next to ``path``, None if there is none to
+    serve. The sibling is rewritten when it is older than ``path``, but only
+    written for files under ``gzip_roots``, where it is removed with the run
+    file.
+    """
+    if st is None:
+        st = os.stat(path)
+
+    gz_fn = path + '.gz'
+    if _exists(gz_fn) and os.stat(gz_fn).st_mtime_ns >= st.st_mtime_ns:
+        return gz_fn
+
+    if not os.path.abspath(path).startswith(gzip_roots):
+        return None
+
+    tmp_fn = f'{gz_fn}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(path, 'rb') as src, gzip.open(tmp_fn, 'wb', compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+    os.replace(tmp_fn, gz_fn)
+    return gz_fn
+
+
+def file_response(request: Request, path: str, media_type: str = 'application/text',
+                  max_age: int = 0) -> Response:
+    """
+    Serve a file without reading it into memory.
+
+    The file is streamed by ``FileResponse`` (sendfile where the server
+    supports it, Range requests included). Clients that accept gzip get the
+    precompressed ``.gz`` next to the file when there is one (see
+    ``gzip_path``), other files are sent uncompressed. The ETag is the content digest,
+    so a matching ``If-None-Match`` is answered with an empty 304.
+
+    Raises FileNotFoundError when ``path`` does not exist.
+    """
+    st = os.stat(path)
+    digest = file_digest(path, st)
+    etag = f'"{digest[:32]}"'
+
+    headers = {
+        'ETag': etag,
+        'Vary': 'Accept-Encoding',
+        'Cache-Control': f'public, max-age={max_age}' if max_age else 'no-cache'
+    }
+
+    if st.st_size >= GZIP_MIN_SIZE and accepts_gzip(request):
+        try:
+            gz_fn = gzip_path(path, st)
+        except OSError:
+            gz_fn = None
+
+        if gz_fn is not None:
+            # each encoding is its own representation with its own strong ETag
+            headers['ETag'] = etag = etag[:-1] + '-gz"'
+            headers['Content-Encoding'] = 'gzip'
+            path, st = gz_fn, os.stat(gz_fn)
+
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    return FileResponse(path, headers=headers, media_type=media_type, stat_result=st)
@@ -29,6 +29,43 @@ def log_run(ip, model):
         fp.write(b'\n')
 
 
+def log_climate(model, climate):
+    """
+    Append the station, cligen version and years of a run's climate to
+    ``{year}/{model}.climates.log`` (tab separated text, one run per line).
+    """
+    year = datetime.now().year
+    
+    log_fn = _join(_logdir, f'{year}/{model}.climates.log')
+    os.makedirs(os.path.dirname(log_fn), exist_ok=True)
+    
+    database = climate.database or 'legacy'
+    
+    with open(log_fn, 'a') as fp:
+        fp.write(f'{int(time())}\t{database}\t{climate.par_id}\t'
+                 f'{climate.cligen_version}\t{climate.input_years}\n')
+
+
+def read_climate_log(model, year):
+    
+    log_fn = _join(_logdir, f'{year}/{model}.climates.log')
+    if not os.path.exists(log_fn):
+        return []
+    
+    runs = []
+    with open(log_fn, 'r') as fp:
+        for line in fp:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) != 5:
+                continue
+            
+            timestamp, database, par_id, cligen_version, input_years = fields
+            runs.append((datetime.fromtimestamp(int(timestamp)), database, par_id, 
+                         cligen_version, int(input_years)))
+    
+    return runs
+
+
 def read_log(model, year):
     
     log_fn = _join(_logdir, f'{year}/{model}.log')
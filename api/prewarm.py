@@ -0,0 +1,132 @@
+"""
+Climate packs: pregenerated climates (with their statistics sidecars) for the
+most used stations, loaded into the climate store at startup so the first
+run of the day at a common station does not wait on cligen.
+
+    python -m api.prewarm build [--top 25] [--log-years 2025 2024]
+                                [--station legacy:WA459074 ...]
+                                [--cligen-versions 4.3 5.3.2] [--input-years 100]
+    python -m api.prewarm load
+
+A pack is itself a climate store directory plus a ``manifest.json``.
+"""
+import os
+from os.path import join as _join
+from os.path import exists as _exists
+
+import json
+import argparse
+from collections import Counter
+from datetime import datetime
+
+from .climate_store import ClimateStore, climate_store
+from .cligen_pool import PREWARM
+from .logger import read_climate_log
+
+_thisdir = os.path.dirname(os.path.abspath(__file__))
+
+pack_dir = _join(_thisdir, 'db/climate_pack')
+
+logged_models = ('rockclim', 'wepproad', 'disturbed', 'ermit')
+
+
+def popular_stations(top: int, log_years: list) -> list:
+    """
+    The ``top`` most run (database, par_id) pairs per database in the climate logs.
+    """
+    counts = {}
+    for year in log_years:
+        for model in logged_models:
+            for _, database, par_id, _, _ in read_climate_log(model, year):
+                if par_id == 'None':
+                    continue
+                counts.setdefault(database, Counter())[par_id] += 1
+
+    stations = []
+    for database in sorted(counts):
+        stations.extend((database, par_id) for par_id, _ in counts[database].most_common(top))
+    return stations
+
+
+def build_pack(stations: list, cligen_versions: list, input_years: int, out_dir: str = pack_dir) -> dict:
+    from .rockclim import ClimatePars, get_station
+
+    pack = ClimateStore(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+
+    climates = []
+    for database, par_id in stations:
+        for cligen_version in cligen_versions:
+            climate_pars = ClimatePars(database=database, par_id=par_id,
+                                       cligen_version=cligen_version, input_years=input_years)
+            try:
+                station = get_station(climate_pars)
+            except Exception as e:
+                print(f'skipping {database}:{par_id} ({e})')
+                continue
+
+            cli_fn = pack.get_or_generate(station, cligen_version, input_years, priority=PREWARM)
+            climates.append({
+                'database': database,
+                'par_id': par_id,
+                'cligen_version': cligen_version,
+                'input_years': input_years,
+                'path': os.path.relpath(cli_fn, out_dir)
+            })
+            print(f'{database}:{par_id} cligen {cligen_version} -> {cli_fn}')
+
+    manifest = {
+        'created': datetime.now().isoformat(),
+        'climates': climates
+    }
+    with open(_join(out_dir, 'manifest.json'), 'w') as fp:
+        json.dump(manifest, fp, indent=2)
+
+    return manifest
+
+
+def load_pack(src_dir: str = pack_dir) -> int:
+    """
+    Import a climate pack into the climate store, returns the number of climates imported.
+    """
+    if not _exists(_join(src_dir, 'manifest.json')):
+        return 0
+
+    return climate_store.import_store(src_dir)
+
+
+def _parse_station(value: str):
+    database, _, par_id = value.rpartition(':')
+    return database or 'legacy', par_id
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build or load a climate pack')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='generate a climate pack')
+    build_parser.add_argument('--out', default=pack_dir)
+    build_parser.add_argument('--top', type=int, default=25,
+                              help='number of most used stations per database taken from the climate logs')
+    build_parser.add_argument('--log-years', type=int, nargs='+',
+                              default=[datetime.now().year, datetime.now().year - 1])
+    build_parser.add_argument('--station', action='append', default=[],
+                              help='explicit station as database:par_id, e.g. legacy:WA459074')
+    build_parser.add_argument('--cligen-versions', nargs='+', default=['4.3', '5.3.2'])
+    build_parser.add_argument('--input-years', type=int, default=100)
+
+    load_parser = subparsers.add_parser('load', help='import a climate pack into the climate store')
+    load_parser.add_argument('--pack', default=pack_dir)
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        stations = [_parse_station(s) for s in args.station]
+        if args.top > 0:
+            stations.extend(s for s in popular_stations(args.top, args.log_years) if s not in stations)
+
+        manifest = build_pack(stations, args.cligen_versions, args.input_years, args.out)
+        print(f"{len(manifest['climates'])} climates written to {args.out}")
+
+    elif args.command == 'load':
+        print(f'{load_pack(args.pack)} climates imported from {args.pack}')
@@ -3,12 +3,26 @@ import json
 from os.path import join as _join
 import enum
 import math
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 
 from fastapi import APIRouter, Query, Response, Request, HTTPException, Body
-from typing import Optional
+from fastapi.responses import RedirectResponse
+from typing import Optional, Union
 from pydantic import BaseModel, Field, conlist, ValidationError, field_validator
 
-from wepppy2.climates.cligen import CligenStationsManager, Cligen, ClimateFile
+from wepppy2.climates.cligen import Station, Cligen
+
+from .climate_store import climate_store
+from .cligen_pool import cligen_pool, INTERACTIVE, BATCH
+from .climate_stats import load_climate_stats
+from .station_registry import get_registry, database_key, databases
+from .logger import log_climate
+from .user_pars import user_par_store, pars_digest
+from .http_cache import cached_response, cached_json_response, file_response, LONG_MAX_AGE
+from . import build_static
 
 router = APIRouter()
 
@@ -49,6 +63,8 @@ class ClimatePars(BaseModel):
         cligen_version (str): The version of the CLIGEN model. Options are:
             - 4.3: Legacy FSWEPP
             - 5.3.2: WEPPcloud
+        ensemble (int): The number of climate realizations (cligen seeds). 
+            Models run once per realization and report distributions.
     """
     database: Optional[str] = "legacy"
     state_code: Optional[str] = None
@@ -58,6 +74,7 @@ class ClimatePars(BaseModel):
     location: Optional[Location] = None
     use_prism: Optional[bool] = False
     user_defined_par_mod: Optional[UserDefinedParMod] = None
+    ensemble: int = Field(default=1, ge=1, le=20)
     
     @field_validator('database')
     def validate_database(cls, value):
@@ -73,7 +90,51 @@ class ClimatePars(BaseModel):
                      self.cligen_version, 
                      self.location, 
                      self.use_prism, 
-                     self.user_defined_par_mod))
+                     self.user_defined_par_mod,
+                     self.ensemble))
+    
+    def key_dict(self) -> dict:
+        # the ensemble size is a run option, not part of a saved parameter set
+        return self.model_dump(mode='json', exclude={'ensemble'})
+    
+    def digest(self) -> str:
+        """
+        Stable key of the parameters. Unlike ``hash()`` it does not change
+        between worker processes or restarts.
+        """
+        return pars_digest(self.key_dict())
+
+
+def _static_response(request: Request, relpath: str, media_type: str = 'application/json'):
+    """
+    Prebuilt artifact (see api/build_static.py): a redirect to nginx when
+    FSWEPP2_STATIC_URL is set, otherwise the file itself. None if not built.
+    """
+    path = build_static.static_path(relpath)
+    if path is None:
+        return None
+    
+    if build_static.static_url:
+        return RedirectResponse(
+            f'{build_static.static_url}/{build_static.current_version()}/{relpath}', status_code=307)
+    
+    return file_response(request, path, media_type=media_type, max_age=LONG_MAX_AGE)
+
+
+def _query_climate_pars(**kwargs) -> ClimatePars:
+    """
+    ClimatePars from the query parameters of the GET routes.
+    """
+    longitude = kwargs.pop('longitude', None)
+    latitude = kwargs.pop('latitude', None)
+    if longitude is not None and latitude is not None:
+        kwargs['location'] = Location(longitude=longitude, latitude=latitude)
+    
+    try:
+        return ClimatePars(**{k: v for k, v in kwargs.items() if v is not None})
+    except ValidationError as e:
+        raise HTTPException(status_code=422, 
+                            detail=e.errors(include_url=False, include_context=False))
     
     
 @router.post("/rockclim/GET/available_state_codes")
@@ -85,9 +146,20 @@ def available_state_codes(
         }
     )
 ):
-    stationManager = CligenStationsManager(climate_pars.database)
-    sorted_keys = sorted(stationManager.states)
-    return {k: stationManager.states[k] for k in sorted_keys}
+    registry = get_registry(climate_pars.database)
+    sorted_keys = sorted(registry.states)
+    return {k: registry.states[k] for k in sorted_keys}
+
+
+@router.get("/rockclim/GET/available_state_codes")
+def available_state_codes_get(request: Request, database: Optional[str] = None):
+    climate_pars = _query_climate_pars(database=database)
+    
+    response = _static_response(request, f'rockclim/{database_key(climate_pars.database)}/states.json')
+    if response is not None:
+        return response
+    
+    return cached_json_response(request, available_state_codes(climate_pars))
 
 class StationsGeoJSONRequest(BaseModel):
     database: Optional[str] = Field(
@@ -116,8 +188,47 @@ def stations_geojson(
     }
     )
 ):
-    stationManager = CligenStationsManager(payload.database, payload.bbox)
-    return stationManager.to_geojson()
+    registry = get_registry(payload.database)
+    return registry.to_geojson(registry.in_bbox(payload.bbox))
+
+
+@router.get("/rockclim/GET/stations_geojson")
+def stations_geojson_get(request: Request, database: Optional[str] = None):
+    """
+    Every station of the database as GeoJSON.
+    """
+    climate_pars = _query_climate_pars(database=database)
+    database = database_key(climate_pars.database)
+    
+    response = _static_response(request, f'rockclim/{database}/stations.geojson', 
+                                media_type='application/geo+json')
+    if response is not None:
+        return response
+    
+    registry = get_registry(database)
+    return cached_json_response(request, registry.to_geojson(range(len(registry))))
+
+
+@lru_cache(maxsize=4096)
+def _stations_tile(database: str, z: int, x: int, y: int) -> bytes:
+    return json.dumps(get_registry(database).tile(z, x, y)).encode('utf-8')
+
+
+@router.get("/rockclim/GET/stations_tile/{database}/{z}/{x}/{y}")
+def stations_tile(request: Request, database: str, z: int, x: int, y: int):
+    """
+    Stations in a z/x/y map tile as GeoJSON, clustered at low zoom levels.
+
+    Tiles only change when the station database changes so they are served
+    with a long cache lifetime.
+    """
+    if database not in databases:
+        raise HTTPException(status_code=422, detail="Invalid database")
+    
+    if not (0 <= z <= 18 and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=422, detail="Invalid tile")
+    
+    return cached_response(request, _stations_tile(database, z, x, y))
 
 
 @router.post("/rockclim/GET/stations_in_state")
@@ -129,14 +240,40 @@ def stations_in_state(
         }
     )
 ):
-    stationManager = CligenStationsManager(climate_pars.database)
-
     if climate_pars.state_code is None:
         raise HTTPException(status_code=422, detail="State Code is required")
     
-    stations = stationManager.get_stations_in_state(climate_pars.state_code)
+    registry = get_registry(climate_pars.database)
+    return registry.as_dicts(registry.in_state(climate_pars.state_code))
 
-    return [s.as_dict() for s in stations]
+
+@router.get("/rockclim/GET/stations_in_state")
+def stations_in_state_get(request: Request, state_code: str, database: Optional[str] = None):
+    climate_pars = _query_climate_pars(database=database, state_code=state_code)
+    
+    if state_code.isalnum():
+        response = _static_response(
+            request, f'rockclim/{database_key(climate_pars.database)}/stations_in_state/{state_code}.json')
+        if response is not None:
+            return response
+    
+    return cached_json_response(request, stations_in_state(climate_pars))
+
+
+@router.get("/rockclim/GET/station_search")
+def station_search(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100),
+    database: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100)
+):
+    """
+    Stations whose id, name or state match every word of ``q`` as a prefix,
+    best matches first (e.g. ``q=moscow id`` or ``q=WA45``).
+    """
+    climate_pars = _query_climate_pars(database=database)
+    registry = get_registry(climate_pars.database)
+    return cached_json_response(request, registry.as_dicts(registry.search(q, limit)))
 
 
 @router.post("/rockclim/GET/closest_stations")
@@ -154,26 +291,110 @@ def get_closest_stations(
     if climate_pars.location is None:
         raise HTTPException(status_code=422, detail="Location is required")
     
-    stationManager = CligenStationsManager(climate_pars.database)
-    stations = stationManager.get_closest_stations(
+    registry = get_registry(climate_pars.database)
+    return registry.closest(
         (climate_pars.location.longitude, climate_pars.location.latitude), 
         num_stations=10)
 
-    return [s.as_dict() for s in stations]
+
+class ClosestStationsBatchRequest(BaseModel):
+    database: Optional[str] = Field(
+        default="legacy",
+        description='Database name: "ghcn", "au", "2015", "legacy", or None (default to "legacy")'
+    )
+    locations: conlist(conlist(float, min_length=2, max_length=2), min_length=1, max_length=50000) = Field(
+        description="List of [longitude, latitude] points"
+    )
+    num_stations: int = Field(default=1, ge=1, le=50)
+
+    @field_validator('database')
+    def validate_database(cls, value):
+        if value not in [None, "legacy", "2015", "au", "ghcn"]:
+            raise ValueError("Invalid database")
+        return value
+
+
+@router.post("/rockclim/GET/closest_stations_batch")
+def get_closest_stations_batch(
+    payload: ClosestStationsBatchRequest = Body(
+        ...,
+        example={
+            'database': '2015',
+            'locations': [[-116, 47], [-117.2, 46.7]],
+            'num_stations': 3
+        }
+    )
+):
+    """
+    Nearest stations for many locations in one request.
+
+    Returns the metadata of every matched station once, keyed by station id,
+    and for each location (in request order) the ids and distances (km) of
+    its nearest stations, nearest first.
+    """
+    registry = get_registry(payload.database)
+    indices, distances = registry.nearest(payload.locations, payload.num_stations)
+
+    unique_indices = np.unique(indices)
+    stations = {str(registry.ids[i]): registry.as_dict(int(i)) for i in unique_indices}
+
+    return {
+        'stations': stations,
+        'nearest': registry.ids[indices].tolist(),
+        'distances_km': np.round(distances, 3).tolist()
+    }
+
+
+def _read_station(database: str, par_id: str):
+    # the registry keeps the par file path of every station, the station
+    # database itself is only read when the registry is compiled
+    registry = get_registry(database)
+    return Station(str(registry.par_paths[registry.index_of(par_id)]))
+
+
+# PRISM 30 arc-second (800 m) grid. The 2.5 arc-minute (4 km) grid shares its
+# origin, so every 800 m cell nests inside exactly one 4 km cell.
+PRISM_ULX = -125.0 - 1.0 / 48.0
+PRISM_ULY = 49.9375
+PRISM_CELLSIZE = 1.0 / 120.0
+
+
+def prism_cell(longitude: float, latitude: float):
+    col = math.floor((longitude - PRISM_ULX) / PRISM_CELLSIZE)
+    row = math.floor((PRISM_ULY - latitude) / PRISM_CELLSIZE)
+    return col, row
+
+
+def prism_cell_center(col: int, row: int):
+    return (PRISM_ULX + (col + 0.5) * PRISM_CELLSIZE, 
+            PRISM_ULY - (row + 0.5) * PRISM_CELLSIZE)
+
+
+@lru_cache(maxsize=1024)
+def _prism_station(database: str, par_id: str, col: int, row: int):
+    # all locations within a PRISM cell sample the same raster values, so the
+    # modified station is computed once per (station, cell) at the cell center
+    longitude, latitude = prism_cell_center(col, row)
+    return _read_station(database, par_id).prism_mod(longitude, latitude)
 
 
 def get_station(climate_pars: ClimatePars):
-    stationManager = CligenStationsManager(climate_pars.database)
-    stationMeta = stationManager.get_station_fromid(climate_pars.par_id)
-    station = stationMeta.get_station()
+    registry = get_registry(climate_pars.database)
+    if registry.index_of(climate_pars.par_id) is None:
+        raise HTTPException(status_code=404, detail=f"Station {climate_pars.par_id} not found")
+    
+    database = database_key(climate_pars.database)
     
     if climate_pars.use_prism:
         if climate_pars.location is None:
             raise HTTPException(status_code=422, detail="Location is required")
         
-        station = station.prism_mod(
+        col, row = prism_cell(
             climate_pars.location.longitude, 
             climate_pars.location.latitude)
+        station = _prism_station(database, climate_pars.par_id, col, row)
+    else:
+        station = _read_station(database, climate_pars.par_id)
         
     if climate_pars.user_defined_par_mod is not None:
         station = station.mod(
@@ -196,6 +417,30 @@ def get_station_par(
     return Response(content=station.contents, media_type="application/text")
 
 
+@router.get("/rockclim/GET/station_par")
+def get_station_par_get(
+    request: Request,
+    par_id: str,
+    database: Optional[str] = None,
+    longitude: Optional[float] = None,
+    latitude: Optional[float] = None,
+    use_prism: bool = False
+):
+    climate_pars = _query_climate_pars(
+        database=database, par_id=par_id, 
+        longitude=longitude, latitude=latitude, use_prism=use_prism)
+    
+    if not use_prism and par_id.isalnum():
+        response = _static_response(
+            request, f'rockclim/{database_key(climate_pars.database)}/par/{par_id}.par', 
+            media_type="application/text")
+        if response is not None:
+            return response
+    
+    station = get_station(climate_pars)
+    return cached_response(request, station.contents, media_type="application/text")
+
+
 @router.post("/rockclim/GET/station_par_monthlies")
 def get_station_par_monthlies(
     climate_pars: ClimatePars = Body(
@@ -216,24 +461,180 @@ def get_station_par_monthlies(
     return monthlies
 
 
-def get_climate(climate_pars: ClimatePars):
-    wd="/ramdisk/rockclim/"
+@router.get("/rockclim/GET/station_par_monthlies")
+def get_station_par_monthlies_get(
+    request: Request,
+    par_id: str,
+    database: Optional[str] = None,
+    longitude: Optional[float] = None,
+    latitude: Optional[float] = None,
+    use_prism: bool = False
+):
+    climate_pars = _query_climate_pars(
+        database=database, par_id=par_id, 
+        longitude=longitude, latitude=latitude, use_prism=use_prism)
+    return cached_json_response(request, get_station_par_monthlies(climate_pars))
+
+
+class PrismPoint(BaseModel):
+    par_id: Optional[str] = None
+    longitude: float
+    latitude: float
+
+
+class PrismMonthliesBatchRequest(BaseModel):
+    """
+    Either ``points`` or ``bbox`` + ``grid_spacing`` (degrees) must be given.
+    Points without a ``par_id`` use the nearest station of ``database``.
+    """
+    database: Optional[str] = "legacy"
+    points: Optional[conlist(PrismPoint, min_length=1, max_length=5000)] = None
+    bbox: Optional[conlist(float, min_length=4, max_length=4)] = Field(
+        default=None,
+        description="Bounding box: [ul_x, ul_y, lr_x, lr_y]"
+    )
+    grid_spacing: Optional[float] = Field(default=None, gt=0)
+    par_id: Optional[str] = None
     
-    station = get_station(climate_pars)
+    @field_validator('database')
+    def validate_database(cls, value):
+        if value not in [None, "legacy", "2015", "au", "ghcn"]:
+            raise ValueError("Invalid database")
+        return value
+    
+    @field_validator('bbox')
+    def validate_bbox(cls, value):
+        if value is not None:
+            l, t, r, b = value
+            if not (l < r and b < t):
+                raise ValueError("bbox must be [ul_x, ul_y, lr_x, lr_y] with ul_x < lr_x and lr_y < ul_y")
+        return value
     
-    os.makedirs(wd, exist_ok=True)
+    def get_points(self) -> list:
+        if self.points is not None:
+            return self.points
+        
+        if self.bbox is None or self.grid_spacing is None:
+            raise HTTPException(status_code=422, detail="points or bbox and grid_spacing are required")
+        
+        l, t, r, b = self.bbox
+        longitudes = np.arange(l + self.grid_spacing / 2.0, r, self.grid_spacing)
+        latitudes = np.arange(t - self.grid_spacing / 2.0, b, -self.grid_spacing)
+        if len(longitudes) * len(latitudes) > 5000:
+            raise HTTPException(status_code=422, detail="Grid is limited to 5000 points")
+        if len(longitudes) * len(latitudes) == 0:
+            raise HTTPException(status_code=422, detail="Grid has no points, grid_spacing is larger than the bbox")
+        
+        return [PrismPoint(par_id=self.par_id, longitude=float(lng), latitude=float(lat))
+                for lat in latitudes for lng in longitudes]
+
+
+@router.post("/rockclim/GET/station_par_monthlies_batch")
+def get_station_par_monthlies_batch(
+    payload: PrismMonthliesBatchRequest = Body(
+        ...,
+        example={
+            'database': 'legacy',
+            'points': [
+                {'par_id': 'WA459074', 'longitude': -117.0, 'latitude': 47.0},
+                {'par_id': 'WA459074', 'longitude': -117.1, 'latitude': 47.05}
+            ]
+        }
+    )
+):
+    """
+    PRISM-adjusted monthlies for many locations.
 
-    _hash = hash(climate_pars)
-    cli_fname = f"{_hash}.cli"
+    Points are grouped by (station, PRISM cell) and each group is evaluated
+    once. The response is columnar: per-point arrays plus one
+    (points x 12 months) matrix per monthly variable.
+    """
+    database = database_key(payload.database)
+    registry = get_registry(database)
+    points = payload.get_points()
+    
+    par_ids = [p.par_id for p in points]
+    missing = [i for i, par_id in enumerate(par_ids) if par_id is None]
+    if missing:
+        indices, _ = registry.nearest([(points[i].longitude, points[i].latitude) for i in missing], 1)
+        for i, j in zip(missing, indices[:, 0]):
+            par_ids[i] = str(registry.ids[j])
+    
+    for par_id in set(par_ids):
+        if registry.index_of(par_id) is None:
+            raise HTTPException(status_code=404, detail=f"Station {par_id} not found")
+    
+    keys = [(par_id, *prism_cell(p.longitude, p.latitude)) for par_id, p in zip(par_ids, points)]
+    unique_keys = list(dict.fromkeys(keys))
     
-    cligen = Cligen(station, wd, cliver=climate_pars.cligen_version)
-    cligen.run_multiple_year(climate_pars.input_years, cli_fname=cli_fname)
+    def _monthlies(key):
+        par_id, col, row = key
+        return _prism_station(database, par_id, col, row).get_monthlies()
     
-    return _join(wd, cli_fname)
+    with ThreadPoolExecutor() as executor:
+        monthlies = dict(zip(unique_keys, executor.map(_monthlies, unique_keys)))
+    
+    columns = {}
+    for measure, values in monthlies[unique_keys[0]].items():
+        if isinstance(values, (list, tuple, np.ndarray)) and len(values) == 12:
+            columns[measure] = np.array([monthlies[k][measure] for k in keys], dtype=np.float64)
+    
+    response = {
+        'par_id': par_ids,
+        'longitude': [p.longitude for p in points],
+        'latitude': [p.latitude for p in points],
+        'prism_cell': [[k[1], k[2]] for k in keys],
+        'unique_cells': len(unique_keys),
+    }
+    response.update({measure: matrix.tolist() for measure, matrix in columns.items()})
+    
+    if 'nwds' in columns:
+        response['cumulative_nwds'] = columns['nwds'].sum(axis=1).tolist()
+    
+    return response
+
+
+def get_climate(climate_pars: ClimatePars, realization: int = 0, priority: int = None):
+    if priority is None:
+        # the extra realizations of an ensemble queue behind single climates
+        priority = INTERACTIVE if realization == 0 else BATCH
+    
+    station = get_station(climate_pars)
+    return climate_store.get_or_generate(
+        station, climate_pars.cligen_version, climate_pars.input_years, 
+        seed=realization, priority=priority)
+
+
+def get_climates(climate_pars: ClimatePars) -> list:
+    """
+    Climate files of every realization of the ensemble, realization 0 first.
+    """
+    station = get_station(climate_pars)
+    return climate_store.get_or_generate_ensemble(
+        station, climate_pars.cligen_version, climate_pars.input_years, climate_pars.ensemble)
+
+
+@router.get("/rockclim/GET/climate_store_stats")
+def get_climate_store_stats():
+    """
+    Hit/miss counters of the climate store for the worker serving the request.
+    """
+    return climate_store.stats()
+
+
+@router.get("/rockclim/GET/cligen_pool_stats")
+def get_cligen_pool_stats():
+    """
+    Queue length, running jobs and queue-wait / run-time latencies per
+    priority of the cligen pool of the worker serving the request.
+    """
+    return cligen_pool.stats()
 
 
 @router.post("/rockclim/GET/climate")
 def get_climate_route(
+    request: Request,
+    realization: int = Query(0, ge=0, description="Realization of an ensemble, 0 is the default climate"),
     climate_pars: ClimatePars = Body(
         ...,
         example={
@@ -245,8 +646,9 @@ def get_climate_route(
     """
     Endpoint to get climate data for a specific station.
     This function handles a POST request to retrieve climate data for a specific station
-    based on the provided parameters. It creates necessary directories, generates a 
-    climate file using Cligen, and returns the contents of the generated file.
+    based on the provided parameters. The climate is served from the climate store
+    when an identical climate has already been generated, otherwise it is generated
+    using Cligen. Returns the contents of the climate file.
     Args:
         climate_pars (ClimatePars): An object containing the parameters for the climate 
                                     data request, including database, station ID, Cligen 
@@ -255,11 +657,12 @@ def get_climate_route(
         Response: A Response object containing the contents of the generated climate file 
                 with media type "application/text".
     """
-    cli_fn = get_climate(climate_pars)
+    if realization >= climate_pars.ensemble:
+        raise HTTPException(status_code=422, detail="realization must be less than ensemble")
     
-    with open(cli_fn, "r") as file:
-        contents = file.read()
-    return Response(content=contents, media_type="application/text")
+    cli_fn = get_climate(climate_pars, realization)
+    log_climate(model="rockclim", climate=climate_pars)
+    return file_response(request, cli_fn)
 
 @router.post("/rockclim/GET/climate_monthlies")
 def get_climate_monthlies_route(
@@ -272,21 +675,222 @@ def get_climate_monthlies_route(
     )
 ):
     cli_fn = get_climate(climate_pars)
-    climate = ClimateFile(cli_fn)
-    return climate.calc_monthlies()
+    return load_climate_stats(cli_fn)['monthlies']
+    
+
+class MonthliesComparisonRequest(BaseModel):
+    """
+    ``source`` selects the monthlies that are compared:
+        - par: the station parameters (``station_par_monthlies``)
+        - climate: the generated climates (``climate_monthlies``)
+    """
+    climates: conlist(ClimatePars, min_length=1, max_length=20)
+    source: str = "par"
+    
+    @field_validator('source')
+    def validate_source(cls, value):
+        if value not in ["par", "climate"]:
+            raise ValueError("Invalid source")
+        return value
+
+
+def _par_monthlies_key(climate_pars: ClimatePars) -> str:
+    # only the fields that change the station parameters, PRISM locations
+    # snapped to their cell so nearby locations share a cache entry
+    location = None
+    if climate_pars.use_prism and climate_pars.location is not None:
+        longitude, latitude = prism_cell_center(*prism_cell(
+            climate_pars.location.longitude, climate_pars.location.latitude))
+        location = Location(longitude=longitude, latitude=latitude)
+    
+    return ClimatePars(
+        database=database_key(climate_pars.database),
+        par_id=climate_pars.par_id,
+        location=location,
+        use_prism=climate_pars.use_prism,
+        user_defined_par_mod=climate_pars.user_defined_par_mod).model_dump_json()
+
+
+@lru_cache(maxsize=2048)
+def _par_monthlies(key: str) -> dict:
+    return get_station_par_monthlies(ClimatePars.model_validate_json(key))
+
+
+def _climate_monthlies(climate_pars: ClimatePars) -> dict:
+    # cached by the climate store and its statistics sidecar
+    return load_climate_stats(get_climate(climate_pars, priority=BATCH))['monthlies']
+
+
+@router.post("/rockclim/GET/compare_monthlies")
+def compare_monthlies(
+    payload: MonthliesComparisonRequest = Body(
+        ...,
+        example={
+            'source': 'par',
+            'climates': [
+                {'par_id': 'WA459074'},
+                {'par_id': 'WA459074', 'use_prism': True, 
+                 'location': {'longitude': -117.0, 'latitude': 47.0}},
+                {'par_id': 'ID106152'}
+            ]
+        }
+    )
+):
+    """
+    Monthlies of several stations side by side.
+
+    The stations are evaluated in parallel. The response is columnar: one
+    (stations x 12 months) matrix per monthly variable, in request order,
+    and one list per scalar value.
+    """
+    for climate_pars in payload.climates:
+        if get_registry(climate_pars.database).index_of(climate_pars.par_id) is None:
+            raise HTTPException(status_code=404, detail=f"Station {climate_pars.par_id} not found")
     
+    if payload.source == "par":
+        keys = [_par_monthlies_key(climate_pars) for climate_pars in payload.climates]
+        with ThreadPoolExecutor() as executor:
+            monthlies = list(executor.map(_par_monthlies, keys))
+    else:
+        with ThreadPoolExecutor() as executor:
+            monthlies = list(executor.map(_climate_monthlies, payload.climates))
+    
+    response = {
+        'source': payload.source,
+        'database': [database_key(c.database) for c in payload.climates],
+        'par_id': [c.par_id for c in payload.climates],
+        'use_prism': [bool(c.use_prism) for c in payload.climates],
+        'user_defined': [c.user_defined_par_mod is not None for c in payload.climates],
+    }
+    
+    for measure, values in monthlies[0].items():
+        if measure in response:
+            continue
+        if isinstance(values, (list, tuple, np.ndarray)) and len(values) == 12:
+            response[measure] = np.array([m[measure] for m in monthlies], dtype=np.float64).tolist()
+        elif isinstance(values, (int, float, np.number)):
+            response[measure] = [float(m[measure]) for m in monthlies]
+    
+    return response
+
+
+# one value for every month, or 12 monthly values
+MonthlyDelta = Union[float, conlist(float, min_length=12, max_length=12)]
+
+
+class ScenarioSweepRequest(BaseModel):
+    """
+    Climate-change grid for one station: every combination of a precipitation
+    multiplier and a temperature change (degrees C, added to tmax and tmin).
+    Each multiplier or change is one value or 12 monthly values. The deltas
+    are applied to the station monthlies, or to
+    ``climate.user_defined_par_mod`` when given.
+    
+    ``output`` selects what is returned per scenario:
+        - monthlies: monthlies of the generated climates
+        - digests: climate store digests of the generated climates
+    """
+    climate: ClimatePars
+    ppt_multipliers: conlist(MonthlyDelta, min_length=1, max_length=10) = [1.0]
+    temp_deltas_c: conlist(MonthlyDelta, min_length=1, max_length=10) = [0.0]
+    output: str = "monthlies"
+    
+    @field_validator('ppt_multipliers')
+    def validate_ppt_multipliers(cls, value):
+        if any(v <= 0 for m in value for v in _monthly(m)):
+            raise ValueError("Precipitation multipliers must be positive")
+        return value
+    
+    @field_validator('output')
+    def validate_output(cls, value):
+        if value not in ["monthlies", "digests"]:
+            raise ValueError("Invalid output")
+        return value
 
-def load_user_data(filepath):
-    if os.path.exists(filepath):
-        with open(filepath, 'r') as file:
-            return json.load(file)
-    return {}
 
+def _monthly(delta) -> list:
+    if isinstance(delta, (list, tuple)):
+        return [float(v) for v in delta]
+    return [float(delta)] * 12
 
-def save_user_data(filepath, data):
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    with open(filepath, 'w') as file:
-        json.dump(data, file, indent=4)
+
+def _describe(delta, fmt: str) -> str:
+    if isinstance(delta, (list, tuple)):
+        return '[' + ' '.join(format(v, fmt) for v in delta) + ']'
+    return format(delta, fmt)
+
+
+def scenario_par_mod(base: dict, ppt_multiplier: MonthlyDelta, temp_delta_c: MonthlyDelta) -> UserDefinedParMod:
+    # the monthlies (station and user defined) are metric, temperatures in degrees C
+    ppt_multipliers = _monthly(ppt_multiplier)
+    temp_deltas_c = _monthly(temp_delta_c)
+    return UserDefinedParMod(
+        description=f'ppt x{_describe(ppt_multiplier, "g")}, temperature {_describe(temp_delta_c, "+g")} C',
+        ppts=[float(v) * m for v, m in zip(base['ppts'], ppt_multipliers)],
+        tmaxs=[float(v) + dt for v, dt in zip(base['tmaxs'], temp_deltas_c)],
+        tmins=[float(v) + dt for v, dt in zip(base['tmins'], temp_deltas_c)])
+
+
+@router.post("/rockclim/GET/scenario_sweep")
+def scenario_sweep(
+    payload: ScenarioSweepRequest = Body(
+        ...,
+        example={
+            'climate': {'par_id': 'WA459074', 'input_years': 30},
+            'ppt_multipliers': [0.8, 0.9, 1.0, 1.1, 1.2],
+            'temp_deltas_c': [0, 1, 2, 3, 4],
+            'output': 'monthlies'
+        }
+    )
+):
+    """
+    Generate a climate for every scenario of a precipitation x temperature
+    grid and return the results as matrices.
+    
+    Scenarios are generated in parallel on the cligen pool (batch priority)
+    and each is cached in the climate store, so repeating or extending a
+    sweep only generates the new scenarios. Monthly variables are returned
+    as (ppt_multipliers x temp_deltas_c x 12) arrays, digests as
+    (ppt_multipliers x temp_deltas_c).
+    """
+    if len(payload.ppt_multipliers) * len(payload.temp_deltas_c) > 50:
+        raise HTTPException(status_code=422, detail="Sweep is limited to 50 scenarios")
+    
+    climate_pars = payload.climate.model_copy(update={'ensemble': 1})
+    
+    if climate_pars.user_defined_par_mod is not None:
+        base = climate_pars.user_defined_par_mod.model_dump()
+    else:
+        base = get_station(climate_pars).get_monthlies()
+    
+    scenarios = [
+        climate_pars.model_copy(update={'user_defined_par_mod': scenario_par_mod(base, m, dt)})
+        for m in payload.ppt_multipliers for dt in payload.temp_deltas_c
+    ]
+    
+    with ThreadPoolExecutor(max_workers=cligen_pool.workers) as executor:
+        cli_fns = list(executor.map(lambda pars: get_climate(pars, priority=BATCH), scenarios))
+    
+    shape = (len(payload.ppt_multipliers), len(payload.temp_deltas_c))
+    response = {
+        'par_id': climate_pars.par_id,
+        'ppt_multipliers': payload.ppt_multipliers,
+        'temp_deltas_c': payload.temp_deltas_c,
+    }
+    
+    if payload.output == "digests":
+        # <root>/<digest>/<years>y.cli
+        digests = [os.path.basename(os.path.dirname(cli_fn)) for cli_fn in cli_fns]
+        response['digest'] = np.array(digests, dtype=object).reshape(shape).tolist()
+        return response
+    
+    monthlies = [load_climate_stats(cli_fn)['monthlies'] for cli_fn in cli_fns]
+    for measure, values in monthlies[0].items():
+        if isinstance(values, (list, tuple)) and len(values) == 12:
+            response[measure] = np.array(
+                [m[measure] for m in monthlies], dtype=np.float64).reshape(*shape, 12).tolist()
+    
+    return response
 
 
 @router.post("/rockclim/PUT/user_defined_par")
@@ -319,14 +923,9 @@ def save_user_defined_par_mod(
     except:
         raise HTTPException(status_code=422, detail="ClimatePars is not valid")
     
-    user_custom_db_path = _join(_thisdir, f'db/users/rockclim/{user_id}.json')
-    user_data = load_user_data(user_custom_db_path)
-    par_mod_key = str(hash(climate_pars))
+    par_mod_key, created = user_par_store.add(user_id, climate_pars.key_dict())
 
-    # Check if the entry already exists
-    if par_mod_key not in user_data:
-        user_data[par_mod_key] = climate_pars.dict()
-        save_user_data(user_custom_db_path, user_data)
+    if created:
         return {
             "message": f"New entry added with key: {par_mod_key}",
             "par_mod_key": par_mod_key
@@ -359,31 +958,19 @@ def del_user_defined_par_mod(
     if climate_pars.user_defined_par_mod is None:
         raise HTTPException(status_code=400, detail="User-defined parameters are required")
     
-    user_custom_db_path = _join(_thisdir, f'db/users/rockclim/{user_id}.json')
-    user_data = load_user_data(user_custom_db_path)
-    par_mod_key = str(hash(climate_pars))
+    par_mod_key = climate_pars.digest()
 
-    if par_mod_key in user_data:
-        del user_data[par_mod_key]
-        save_user_data(user_custom_db_path, user_data)
+    if user_par_store.delete(user_id, par_mod_key):
         return {"message": f"New entry deleted with key: {par_mod_key}"}
     else:
         return {"message": f"Entry not found: {par_mod_key}"}
 
 @router.get("/rockclim/GET/user_defined_pars")
-def list_user_defined_pars(request: Request):
+def list_user_defined_pars(request: Request, par_id: Optional[str] = None):
     user_id = request.cookies.get("user_id")
     
     if not user_id:
         raise HTTPException(status_code=400, detail="User ID not found in cookies")
     
-    user_custom_db_path = _join(_thisdir, f'db/users/rockclim/{user_id}.json')
-    
-    # Load existing data
-    user_data = load_user_data(user_custom_db_path)
-    
-    if not user_data:
-        return user_data
-    
-    # Return the list of user-defined parameters
-    return user_data
+    # user-defined parameters keyed by par_mod_key, optionally only those of one station
+    return user_par_store.list(user_id, par_id)
@@ -0,0 +1,409 @@
+import os
+from os.path import join as _join
+from os.path import exists as _exists
+
+import re
+import json
+import math
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from wepppy2.climates.cligen import CligenStationsManager
+
+from .climate_store import file_lock
+
+registry_dir = '/ramdisk/rockclim/stations'
+
+# bump when the on-disk layout changes so stale registries are recompiled
+REGISTRY_VERSION = 4
+
+databases = ('legacy', '2015', 'au', 'ghcn')
+
+# tiles below this zoom level are clustered on a CLUSTER_GRID x CLUSTER_GRID grid
+CLUSTER_MAX_ZOOM = 7
+CLUSTER_GRID = 8
+
+# sorts after every character a search token can contain
+_TOKEN_END = '\uffff'
+
+_token_re = re.compile(r'[A-Z0-9]+')
+
+
+def database_key(database) -> str:
+    if database is None:
+        return 'legacy'
+    return str(database)
+
+
+def _json_default(obj):
+    if hasattr(obj, 'item'):
+        return obj.item()
+    return str(obj)
+
+
+def haversine_km(lon, lat, lons, lats):
+    lon, lat = np.radians(lon), np.radians(lat)
+    lons, lats = np.radians(lons), np.radians(lats)
+    a = np.sin((lats - lat) / 2.0) ** 2 + \
+        np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2.0) ** 2
+    return 6371.0 * 2.0 * np.arcsin(np.sqrt(a))
+
+
+def to_unit_vectors(lons, lats):
+    lons, lats = np.radians(lons), np.radians(lats)
+    cos_lats = np.cos(lats)
+    return np.column_stack((cos_lats * np.cos(lons), cos_lats * np.sin(lons), np.sin(lats)))
+
+
+def tokenize(text) -> list:
+    return _token_re.findall(str(text).upper())
+
+
+def tile_bounds(z: int, x: int, y: int):
+    """
+    Web Mercator (slippy map) tile bounds as [ul_x, ul_y, lr_x, lr_y].
+    """
+    n = 2 ** z
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return [west, north, east, south]
+
+
+def compile_registry(database: str, path: str):
+    """
+    Compile the CLIGEN station database into the array-backed registry format.
+
+    The registry is a directory of ``.npy`` arrays (coordinates, ids, state
+    codes, par file paths, a sorted id index, a longitude-sorted index for bbox queries and a
+    sorted token index for name search) plus ``meta.bin``, the concatenated
+    ``StationMeta.as_dict()`` JSON of every station addressed by ``offsets.npy``.
+    """
+    stationManager = CligenStationsManager(database)
+    stations = list(stationManager.stations)
+    states = dict(stationManager.states)
+
+    metas = [s.as_dict() for s in stations]
+    blobs = [json.dumps(d, default=_json_default).encode('utf-8') for d in metas]
+    offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in blobs])
+
+    ids = np.array([str(s.id) for s in stations], dtype=str)
+    par_paths = np.array([str(s.parpath) for s in stations], dtype=str)
+    id_order = np.argsort(ids, kind='stable')
+
+    longitudes = np.array([s.longitude for s in stations], dtype=np.float64)
+    latitudes = np.array([s.latitude for s in stations], dtype=np.float64)
+    lon_order = np.argsort(longitudes, kind='stable')
+
+    # (token, station) pairs from the station id, description, state code and
+    # state name; the position of a token within the description ranks hits
+    tokens, postings, positions = [], [], []
+    for i, (s, d) in enumerate(zip(stations, metas)):
+        station_tokens = {}
+        for position, token in enumerate(tokenize(d.get('desc', ''))):
+            station_tokens.setdefault(token, position)
+        for token in [str(s.id).upper()] + tokenize(s.state) + tokenize(states.get(s.state, '')):
+            station_tokens.setdefault(token, 255)
+        for token, position in station_tokens.items():
+            tokens.append(token)
+            postings.append(i)
+            positions.append(min(position, 255))
+
+    tokens = np.array(tokens, dtype=str)
+    token_order = np.argsort(tokens, kind='stable')
+
+    os.makedirs(path)
+    np.save(_join(path, 'longitudes.npy'), longitudes)
+    np.save(_join(path, 'latitudes.npy'), latitudes)
+    np.save(_join(path, 'lon_order.npy'), lon_order.astype(np.int64))
+    np.save(_join(path, 'sorted_longitudes.npy'), longitudes[lon_order])
+    np.save(_join(path, 'ids.npy'), ids)
+    np.save(_join(path, 'par_paths.npy'), par_paths)
+    np.save(_join(path, 'state_codes.npy'), np.array([str(s.state) for s in stations], dtype=str))
+    np.save(_join(path, 'sorted_ids.npy'), ids[id_order])
+    np.save(_join(path, 'sorted_index.npy'), id_order.astype(np.int64))
+    np.save(_join(path, 'offsets.npy'), offsets)
+    np.save(_join(path, 'search_tokens.npy'), tokens[token_order])
+    np.save(_join(path, 'search_postings.npy'), np.array(postings, dtype=np.int64)[token_order])
+    np.save(_join(path, 'search_positions.npy'), np.array(positions, dtype=np.uint8)[token_order])
+
+    with open(_join(path, 'meta.bin'), 'wb') as fp:
+        for blob in blobs:
+            fp.write(blob)
+
+    with open(_join(path, 'states.json'), 'w') as fp:
+        json.dump(states, fp)
+
+
+class StationRegistry:
+    """
+    Read-only, memory-mapped view of a compiled station database.
+
+    The arrays are opened with ``mmap_mode='r'`` so every worker process
+    shares the same pages through the OS page cache. Nearest-station queries
+    use a KD-tree over unit vectors (chord distance orders stations the same
+    way as great-circle distance), bbox queries a longitude-sorted index.
+    """
+    def __init__(self, database: str, path: str):
+        self.database = database
+        self.path = path
+
+        def _load(name):
+            return np.load(_join(path, name), mmap_mode='r')
+
+        self.longitudes = _load('longitudes.npy')
+        self.latitudes = _load('latitudes.npy')
+        self.ids = _load('ids.npy')
+        self.state_codes = _load('state_codes.npy')
+        self.par_paths = _load('par_paths.npy')
+        self._sorted_ids = _load('sorted_ids.npy')
+        self._sorted_index = _load('sorted_index.npy')
+        self._offsets = _load('offsets.npy')
+        self._lon_order = _load('lon_order.npy')
+        self._sorted_longitudes = _load('sorted_longitudes.npy')
+        self._search_tokens = _load('search_tokens.npy')
+        self._search_postings = _load('search_postings.npy')
+        self._search_positions = _load('search_positions.npy')
+
+        if self._offsets[-1] > 0:
+            self._meta = np.memmap(_join(path, 'meta.bin'), dtype=np.uint8, mode='r')
+        else:
+            self._meta = np.zeros(0, dtype=np.uint8)
+
+        with open(_join(path, 'states.json')) as fp:
+            self.states = json.load(fp)
+
+        self._tree = None
+        if len(self.ids) > 0:
+            self._tree = cKDTree(to_unit_vectors(self.longitudes, self.latitudes))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def as_dict(self, i: int) -> dict:
+        i0, iend = self._offsets[i], self._offsets[i + 1]
+        return json.loads(self._meta[i0:iend].tobytes())
+
+    def as_dicts(self, indices) -> list:
+        return [self.as_dict(int(i)) for i in indices]
+
+    def index_of(self, par_id: str):
+        j = int(np.searchsorted(self._sorted_ids, par_id))
+        if j < len(self._sorted_ids) and self._sorted_ids[j] == par_id:
+            return int(self._sorted_index[j])
+        return None
+
+    def in_state(self, state_code: str) -> np.ndarray:
+        return np.flatnonzero(self.state_codes == state_code)
+
+    def in_bbox(self, bbox) -> np.ndarray:
+        """
+        bbox: [ul_x, ul_y, lr_x, lr_y]
+        """
+        l, t, r, b = bbox
+        j0 = np.searchsorted(self._sorted_longitudes, l, side='left')
+        jend = np.searchsorted(self._sorted_longitudes, r, side='right')
+        candidates = self._lon_order[j0:jend]
+        lats = self.latitudes[candidates]
+        return np.sort(candidates[(lats >= b) & (lats <= t)])
+
+    def _search_term(self, term: str):
+        """
+        Stations with a token starting with ``term`` and their term score:
+        2 for an exact token, 1 for a prefix, minus a small penalty for tokens
+        late in the station description.
+        """
+        j0 = np.searchsorted(self._search_tokens, term, side='left')
+        jend = np.searchsorted(self._search_tokens, term + _TOKEN_END, side='left')
+
+        postings = self._search_postings[j0:jend]
+        scores = np.where(self._search_tokens[j0:jend] == term, 2.0, 1.0) - \
+                 self._search_positions[j0:jend] / 1024.0
+
+        stations, inverse = np.unique(postings, return_inverse=True)
+        best = np.full(len(stations), -np.inf)
+        np.maximum.at(best, inverse, scores)
+        return stations, best
+
+    def search(self, q: str, limit: int = 10) -> np.ndarray:
+        """
+        Ranked indices of the stations matching every word of ``q`` as a
+        prefix of their id, description, state code or state name.
+
+        An exact id match ranks first, then id prefix matches, then stations
+        by summed term score.
+        """
+        terms = tokenize(q)
+        if not terms:
+            return np.zeros(0, dtype=np.int64)
+
+        stations, scores = self._search_term(terms[0])
+        for term in terms[1:]:
+            _stations, _scores = self._search_term(term)
+            stations, i, j = np.intersect1d(stations, _stations, 
+                                            assume_unique=True, return_indices=True)
+            scores = scores[i] + _scores[j]
+
+        if len(stations) == 0:
+            return stations.astype(np.int64)
+
+        q_id = q.strip().upper()
+        ids = self.ids[stations]
+        scores = scores + np.where(ids == q_id, 100.0, 0.0) + \
+                 np.where(np.char.startswith(ids, q_id), 10.0, 0.0)
+
+        order = np.lexsort((stations, -scores))
+        return stations[order[:limit]].astype(np.int64)
+
+    def nearest(self, locations, num_stations: int = 10):
+        """
+        k-nearest stations for an (n, 2) array of (longitude, latitude).
+
+        Returns (indices, distances_km), both shaped (n, num_stations) and
+        ordered nearest first.
+        """
+        locations = np.asarray(locations, dtype=np.float64).reshape(-1, 2)
+        num_stations = min(num_stations, len(self.ids))
+        if num_stations <= 0 or self._tree is None:
+            empty = np.zeros((len(locations), 0))
+            return empty.astype(np.int64), empty
+
+        _, indices = self._tree.query(
+            to_unit_vectors(locations[:, 0], locations[:, 1]), k=num_stations)
+        indices = np.asarray(indices, dtype=np.int64).reshape(len(locations), num_stations)
+
+        distances = haversine_km(
+            locations[:, 0:1], locations[:, 1:2],
+            self.longitudes[indices], self.latitudes[indices])
+        return indices, distances
+
+    def closest(self, location, num_stations: int = 10) -> list:
+        indices, distances = self.nearest([location], num_stations)
+
+        stations = []
+        for i, distance in zip(indices[0], distances[0]):
+            d = self.as_dict(int(i))
+            d['distance_to_query_location'] = float(distance)
+            stations.append(d)
+        return stations
+
+    def to_geojson(self, indices) -> dict:
+        features = []
+        for i in indices:
+            i = int(i)
+            features.append({
+                'type': 'Feature',
+                'geometry': {
+                    'type': 'Point',
+                    'coordinates': [float(self.longitudes[i]), float(self.latitudes[i])]
+                },
+                'properties': self.as_dict(i)
+            })
+        return {'type': 'FeatureCollection', 'features': features}
+
+    def tile(self, z: int, x: int, y: int) -> dict:
+        """
+        GeoJSON for one z/x/y tile.
+
+        At ``CLUSTER_MAX_ZOOM`` and above every station is returned. Below it
+        stations are binned on a grid within the tile and each bin with more
+        than one station becomes a cluster point at the bin centroid with
+        ``cluster: true`` and ``point_count`` properties.
+        """
+        indices = self.in_bbox(tile_bounds(z, x, y))
+        if z >= CLUSTER_MAX_ZOOM or len(indices) == 0:
+            return self.to_geojson(indices)
+
+        n = 2 ** z
+        lons = self.longitudes[indices]
+        lats = np.clip(self.latitudes[indices], -85.0511, 85.0511)
+        px = ((lons + 180.0) / 360.0 * n - x) * CLUSTER_GRID
+        py = ((1.0 - np.arcsinh(np.tan(np.radians(lats))) / np.pi) / 2.0 * n - y) * CLUSTER_GRID
+        cells = np.clip(py.astype(np.int64), 0, CLUSTER_GRID - 1) * CLUSTER_GRID + \
+                np.clip(px.astype(np.int64), 0, CLUSTER_GRID - 1)
+
+        _, inverse, counts = np.unique(cells, return_inverse=True, return_counts=True)
+        centroid_lons = np.bincount(inverse, weights=lons) / counts
+        centroid_lats = np.bincount(inverse, weights=self.latitudes[indices]) / counts
+
+        singles = [indices[k] for k in range(len(indices)) if counts[inverse[k]] == 1]
+        geojson = self.to_geojson(singles)
+
+        for j in np.flatnonzero(counts > 1):
+            geojson['features'].append({
+                'type': 'Feature',
+                'geometry': {
+                    'type': 'Point',
+                    'coordinates': [float(centroid_lons[j]), float(centroid_lats[j])]
+                },
+                'properties': {'cluster': True, 'point_count': int(counts[j])}
+            })
+
+        return geojson
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def registry_path(database: str) -> str:
+    return _join(registry_dir, f'v{REGISTRY_VERSION}', database)
+
+
+def load_registry(database: str, rebuild: bool = False) -> StationRegistry:
+    """
+    Open the compiled registry for ``database``, compiling it first if needed.
+
+    Compilation happens once per host: the first worker compiles under a
+    file lock into a temporary directory that is renamed into place.
+    """
+    path = registry_path(database)
+
+    if rebuild or not _exists(path):
+        with file_lock(path + '.lock'):
+            if rebuild and _exists(path):
+                shutil.rmtree(path)
+
+            if not _exists(path):
+                tmp_dir = tempfile.mkdtemp(prefix='.tmp_', dir=os.path.dirname(path))
+                try:
+                    compile_registry(database, _join(tmp_dir, database))
+                    os.replace(_join(tmp_dir, database), path)
+                finally:
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return StationRegistry(database, path)
+
+
+def get_registry(database) -> StationRegistry:
+    database = database_key(database)
+
+    registry = _registries.get(database)
+    if registry is not None:
+        return registry
+
+    with _registries_lock:
+        registry = _registries.get(database)
+        if registry is None:
+            registry = _registries[database] = load_registry(database)
+
+    return registry
+
+
+def preload():
+    for database in databases:
+        get_registry(database)
+
+
+if __name__ == "__main__":
+    import sys
+
+    for database in sys.argv[1:] or databases:
+        registry = load_registry(database, rebuild=True)
+        print(f'{database}: {len(registry)} stations -> {registry.path}')
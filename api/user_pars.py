@@ -0,0 +1,147 @@
+import os
+from os.path import join as _join
+
+import glob
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+_thisdir = os.path.dirname(os.path.abspath(__file__))
+
+db_fn = _join(_thisdir, 'db/users/rockclim.sqlite')
+
+# per-user JSON files written before the SQLite store, migrated on first open
+legacy_dir = _join(_thisdir, 'db/users/rockclim')
+
+_schema = """
+CREATE TABLE IF NOT EXISTS user_pars (
+    user_id     TEXT NOT NULL,
+    par_mod_key TEXT NOT NULL,
+    par_id      TEXT,
+    database    TEXT,
+    climate_pars TEXT NOT NULL,
+    created     REAL NOT NULL,
+    PRIMARY KEY (user_id, par_mod_key)
+);
+CREATE INDEX IF NOT EXISTS user_pars_user_par_id ON user_pars (user_id, par_id);
+CREATE TABLE IF NOT EXISTS migrations (
+    name    TEXT PRIMARY KEY,
+    applied REAL NOT NULL
+);
+"""
+
+
+def pars_digest(climate_pars: dict) -> str:
+    """
+    Stable key of a ClimatePars dict, identical across processes and restarts.
+    """
+    blob = json.dumps(climate_pars, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+class UserParStore:
+    """
+    User-defined par modifications in SQLite (WAL mode), one row per
+    (user_id, par_mod_key). Adds and deletes are single-row writes, listing
+    is an indexed lookup on user_id (and optionally par_id).
+    """
+    def __init__(self, path: str = db_fn, json_dir: str = legacy_dir):
+        self.path = path
+        self.json_dir = json_dir
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    with conn:
+                        conn.executescript(_schema)
+                    self.migrate_json(conn)
+                    self._initialized = True
+
+        return conn
+
+    def migrate_json(self, conn: sqlite3.Connection):
+        """
+        One-time import of the ``{user_id}.json`` files. The old keys came
+        from ``hash()`` and are replaced with stable digests, which also
+        collapses the duplicates written after restarts.
+        """
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            applied = conn.execute(
+                "SELECT 1 FROM migrations WHERE name = 'json_users'").fetchone()
+            if applied is None:
+                for fn in sorted(glob.glob(_join(self.json_dir, '*.json'))):
+                    user_id = os.path.splitext(os.path.basename(fn))[0]
+                    try:
+                        with open(fn) as fp:
+                            user_data = json.load(fp)
+                    except (OSError, ValueError):
+                        continue
+
+                    for climate_pars in user_data.values():
+                        self._insert(conn, user_id, climate_pars)
+
+                conn.execute("INSERT INTO migrations (name, applied) VALUES ('json_users', ?)",
+                             (time.time(),))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    @staticmethod
+    def _insert(conn, user_id: str, climate_pars: dict) -> bool:
+        par_mod_key = pars_digest(climate_pars)
+        cursor = conn.execute(
+            'INSERT OR IGNORE INTO user_pars '
+            '(user_id, par_mod_key, par_id, database, climate_pars, created) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (user_id, par_mod_key, climate_pars.get('par_id'), climate_pars.get('database'),
+             json.dumps(climate_pars), time.time()))
+        return cursor.rowcount == 1
+
+    def add(self, user_id: str, climate_pars: dict):
+        """
+        Returns (par_mod_key, created).
+        """
+        conn = self._connect()
+        with conn:
+            created = self._insert(conn, user_id, climate_pars)
+        return pars_digest(climate_pars), created
+
+    def delete(self, user_id: str, par_mod_key: str) -> bool:
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                'DELETE FROM user_pars WHERE user_id = ? AND par_mod_key = ?',
+                (user_id, par_mod_key))
+        return cursor.rowcount == 1
+
+    def list(self, user_id: str, par_id: str = None) -> dict:
+        conn = self._connect()
+        if par_id is None:
+            rows = conn.execute(
+                'SELECT par_mod_key, climate_pars FROM user_pars '
+                'WHERE user_id = ? ORDER BY created', (user_id,))
+        else:
+            rows = conn.execute(
+                'SELECT par_mod_key, climate_pars FROM user_pars '
+                'WHERE user_id = ? AND par_id = ? ORDER BY created', (user_id, par_id))
+
+        return {par_mod_key: json.loads(climate_pars) for par_mod_key, climate_pars in rows}
+
+
+user_par_store = UserParStore()
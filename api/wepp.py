@@ -1,178 +1,305 @@
 from all_your_base.stats import weibull_series
 from typing import Optional
+from functools import lru_cache
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pandas as pd
+import os
 import re
+import threading
+from os.path import exists as _exists
+from collections import deque
 
-from wepppy2.climates.cligen import ClimateFile
+from .climate_stats import load_peak_intensities
 
 
-def calc_rec_intervals(annuals: dict, measure: str, rec_intervals=[1, 2, 5, 10]) -> dict:
-    n_years = len(annuals)
+@lru_cache(maxsize=256)
+def _weibull_ranks(rec_intervals: tuple, n_years: int) -> tuple:
+    # (recurrence interval, rank in descending order) pairs
+    return tuple(weibull_series(list(rec_intervals), n_years, method='am').items())
+
+
+def calc_return_periods(annuals: dict, measures, rec_intervals=(1, 2, 5, 10)) -> dict:
+    """
+    Annual events at each recurrence interval for each measure.
+
+    The measures of all years form one year x measure matrix that is
+    ranked with a single stable argsort down the year axis, so ties keep
+    the year order like ``sorted``. Returns
+    {measure: {str(rec): annual dict}}.
+    """
+    events = list(annuals.values())
+    measures = list(measures)
     
-    rec_ranks = weibull_series(rec_intervals, n_years, method='am')
+    M = np.array(list(map(itemgetter(*measures), events)),
+                 dtype=np.float64).reshape(len(events), len(measures))
+    order = np.argsort(-M, axis=0, kind='stable')
     
-    # order events in descending order
-    events = sorted(annuals.values(), key=lambda x: x[measure], reverse=True)
+    rec_ranks = _weibull_ranks(tuple(rec_intervals), len(events))
     
-    recs = {}
-    for rec, rank in rec_ranks.items():
-        recs[str(rec)] = events[rank]
-        
-    return recs
+    return {measure: {str(rec): events[order[rank, j]] for rec, rank in rec_ranks}
+            for j, measure in enumerate(measures)}
+
+
+def calc_rec_intervals(annuals: dict, measure: str, rec_intervals=(1, 2, 5, 10)) -> dict:
+    return calc_return_periods(annuals, [measure], rec_intervals)[measure]
+
+
+def _rainfall_runoff(line: str) -> dict:
+    data = line.split()
+    return {
+        'storms': data[0],
+        'precip': data[1],
+        'rainevents': data[2],
+        'rro': data[3],
+        'snowevents': data[4],
+        'sro': data[5]
+    }
+
+
+def _net_soil_loss_mean(line: str) -> float:
+    return float(line.split('=')[1].replace(' kg/m2 **', '').strip())
+
+
+def _net_soil_loss_max(line: str) -> float:
+    return float(line.split('=')[1].split()[0].strip())
+
+
+def _first_field(line: str) -> str:
+    return line.split()[0]
+
+
+def _value_before_unit(line: str) -> str:
+    return line.split()[-2]
+
+
+# (header, only the first occurrence counts, ((line offset, key, parse), ...))
+_YEAR_SECTIONS = (
+    ('RAINFALL AND RUNOFF SUMMARY', True, ((9, 'rain', _rainfall_runoff),)),
+    ('AREA OF NET SOIL LOSS', True, ((2, 'syr', _net_soil_loss_mean),
+                                     (3, 'sym', _net_soil_loss_max))),
+    ('OFF SITE EFFECTS', True, ((3, 'syp', lambda line: float(_value_before_unit(line))),)),  # kg/m of width
+)
+
+_AVERAGE_SECTIONS = (
+    ('RAINFALL AND RUNOFF SUMMARY', True, ((5, 'storms', _first_field),
+                                           (6, 'rainevents', _first_field),
+                                           (7, 'snowevents', _first_field),
+                                           (14, 'precip', _value_before_unit),
+                                           (15, 'rro', _value_before_unit),
+                                           (17, 'sro', _value_before_unit))),
+    # the last occurrence wins
+    ('AREA OF NET SOIL LOSS', False, ((2, 'syr', _net_soil_loss_mean),
+                                      (3, 'sym', _net_soil_loss_max),
+                                      (10, 'area_of_net_loss', lambda line: float(line[9:18].strip())))),  # m
+    ('OFF SITE EFFECTS', True, ((4, 'syp', lambda line: float(_first_field(line))),)),  # kg/m of width
+)
+
+_average_parsers = {key: parse for _, _, captures in _AVERAGE_SECTIONS for _, key, parse in captures}
+
+
+# any line that starts a section or a year
+_header_re = re.compile('|'.join(re.escape(header) for header in (
+    'YEARLY SUMMARY', 'ANNUAL AVERAGE SUMMARIES',
+    'RAINFALL AND RUNOFF SUMMARY', 'AREA OF NET SOIL LOSS', 'OFF SITE EFFECTS')))
+
+
+class _Block:
+    """
+    Values captured for one year, for the annual averages or for the whole
+    file, and the bookkeeping of the captures still to come.
+    """
+    __slots__ = ('values', 'seen', 'closed', 'last_capture')
+
+    def __init__(self):
+        self.values = {}
+        self.seen = set()            # first_only headers already scheduled
+        self.closed = False          # no more headers belong to the block
+        self.last_capture = -1       # line number of its last capture
+
+
+class _SoilOutputScanner:
+    """
+    Single pass over the lines of a WEPP soil loss output file.
+
+    The values sit a fixed number of lines below their section headers
+    (``_YEAR_SECTIONS``, ``_AVERAGE_SECTIONS``). A header line registers
+    the lines it needs in ``_captures`` by line number, and each line read
+    is looked up there. Three kinds of block collect the values:
+
+    - one per year of detailed output, opened by its ``HILLSLOPE ...
+      YEARLY SUMMARY`` line and closed by the next one (the last year runs
+      to the end of the file). A year's captures can lie past the next
+      year's header, so a closed year is yielded once its last capture is
+      read. Only the years not yet yielded are held.
+    - the ``ANNUAL AVERAGE SUMMARIES`` block, from that header to the end.
+    - the whole file, the averages when that header is missing. Whether
+      it is needed is only known at the end, so it keeps raw lines and
+      they are parsed by ``annual_averages`` when it is used.
+    """
+    def __init__(self):
+        self.detailed = False
+        self._captures = {}          # line number -> [(values, key, parse)]
+        self._years = deque()        # (year, _Block) not yielded yet
+        self._carry = dict.fromkeys(('storms', 'precip', 'rainevents', 'rro',
+                                     'snowevents', 'sro', 'syr', 'sym', 'syp'))
+        self._averages = None
+        self._whole_file = _Block()
+
+    def _schedule(self, n: int, headers: set, block: _Block, sections, parse: bool = True):
+        # register the captures of the sections whose header is on line n
+        for header, first_only, captures in sections:
+            if header not in headers:
+                continue
+            if first_only:
+                if header in block.seen:
+                    continue
+                block.seen.add(header)
+
+            for offset, key, _parse in captures:
+                self._captures.setdefault(n + offset, []).append(
+                    (block.values, key, _parse if parse else None))
+            block.last_capture = max(block.last_capture, n + captures[-1][0])
+
+    def _header(self, n: int, line: str, headers: set):
+        if self.detailed and 'YEARLY SUMMARY' in headers and line.startswith('     HILLSLOPE'):
+            if self._years:
+                self._years[-1][1].closed = True
+            self._years.append((int(line.split()[-1]), _Block()))
+
+        if self._years:
+            self._schedule(n, headers, self._years[-1][1], _YEAR_SECTIONS)
+
+        if self._averages is None and 'ANNUAL AVERAGE SUMMARIES' in headers:
+            self._averages = _Block()
+
+        if self._averages is not None:
+            self._schedule(n, headers, self._averages, _AVERAGE_SECTIONS)
+        else:
+            self._schedule(n, headers, self._whole_file, _AVERAGE_SECTIONS, parse=False)
+
+    def _finished_years(self, n: int):
+        # closed years whose captures are all read by line n, in order;
+        # sections missing from a year keep the values of the previous year
+        years = self._years
+        while years and years[0][1].closed and years[0][1].last_capture <= n:
+            year, block = years.popleft()
+            values = block.values
+            if 'rain' in values:
+                values.update(values.pop('rain'))
+            self._carry.update(values)
+            yield year, dict(self._carry)
+
+    def scan(self, fp):
+        """
+        Yields (year, values) of the detailed annual output as each year is
+        complete.
+        """
+        captures, years = self._captures, self._years
+        n = -1
+        for n, line in enumerate(fp):
+            if n == 0:
+                self.detailed = 'Annual; detailed' in line
+
+            # a year can only finish on a line that fills a capture or closes it
+            if n in captures:
+                for values, key, parse in captures.pop(n):
+                    values[key] = line if parse is None else parse(line)
+                if years:
+                    yield from self._finished_years(n)
+
+            # every header contains one of these, much cheaper than the regex
+            if 'SUMMAR' in line or 'SOIL LOSS' in line or 'OFF SITE' in line:
+                headers = _header_re.findall(line)
+                if headers:
+                    self._header(n, line, set(headers))
+                    if years:
+                        yield from self._finished_years(n)
+
+        # captures left point past the end of the file; the raw ones of the
+        # whole file only matter when it is used
+        for line_n in sorted(captures):
+            for values, key, parse in captures[line_n]:
+                if parse is not None or self._averages is None:
+                    raise IndexError(f'WEPP output ends before line {line_n}')
+
+        if self._years:
+            self._years[-1][1].closed = True
+            yield from self._finished_years(n)
+
+    def annual_averages(self) -> dict:
+        if self._averages is not None:
+            values = self._averages.values
+        else:
+            values = {key: _average_parsers[key](line)
+                      for key, line in self._whole_file.values.items()}
+
+        return {**self._carry, 'area_of_net_loss': None, **values}
+
+
+def _soil_loss_summary(values: dict, slope_length: Optional[float]) -> dict:
+    summary = {
+        'storms': int(values['storms']),
+        'rainevents': int(values['rainevents']),
+        'snowevents': int(values['snowevents']),
+        'precip_mm': float(values['precip']),
+        'runoff_from_rain_mm': float(values['rro']),
+        'runoff_from_snow_mm': float(values['sro']),
+        'runoff_from_rain+snow_mm': float(values['rro']) + float(values['sro']),
+        'soil_loss_mean_kg_m2': values['syr'],
+        'soil_loss_max_kg_m2': values['sym']
+    }
+
+    if slope_length is None:
+        summary['sediment_yield_kg_m'] = values['syp']
+    else:
+        summary['sediment_yield_kg_m2'] = values['syp'] / slope_length
+
+    return summary
+
 
 def parse_wepp_soil_output(
     output_file: str, 
     slope_length: Optional[float] = None, 
     road_width: Optional[float] = None, 
-    rec_intervals=[1, 2, 5, 10],
-    return_period_measures = ['precip_mm', 'runoff_from_rain+snow_mm', 'soil_loss_mean_kg_m2', 'sediment_yield_kg_m']) -> dict:
+    rec_intervals=(1, 2, 5, 10),
+    return_period_measures=('precip_mm', 'runoff_from_rain+snow_mm', 'soil_loss_mean_kg_m2', 'sediment_yield_kg_m')) -> dict:
     
-    storms, rainevents, snowevents, precip, rro, sro, syr, syp = None, None, None, None, None, None, None, None
+    scanner = _SoilOutputScanner()
+    annuals = {}
     
     with open(output_file, 'r') as fp:
-        wepp_out = fp.readlines()
-        
-        for line in wepp_out:
-            if 'VERSION' in line:
-                weppver = line.strip()
-                break
-            
-        annuals = None
-        return_periods = None
-        if 'Annual; detailed' in wepp_out[0]:
-            
-            annual_breaks = []
-            for i, line in enumerate(wepp_out):
-                if line.startswith('     HILLSLOPE') and 'YEARLY SUMMARY' in line:
-                    annual_breaks.append(i)
-            annual_breaks.append(len(wepp_out))
-                    
-            annuals = {}
-            
-            for i in range(len(annual_breaks) - 1):
-                i0 = annual_breaks[i]
-                iend = annual_breaks[i + 1]
-                
-                _line = wepp_out[i0].split()
-                hillslope = int(_line[1])
-                year = int(_line[-1])
-                
-                for j in range(i0, iend):
-                    if 'RAINFALL AND RUNOFF SUMMARY' in wepp_out[j]:
-                        data = wepp_out[j+9].split()
-                        storms = data[0]
-                        precip = data[1]
-                        rainevents = data[2]
-                        rro = data[3]
-                        snowevents = data[4]
-                        sro = data[5]
-                        break
-                    
-                for j in range(i0, iend):
-                    if 'AREA OF NET SOIL LOSS' in wepp_out[j]:
-                        
-                        syr = wepp_out[j+2].split('=')[1].replace(' kg/m2 **', '').strip()
-                        syr = float(syr)
-                        
-                        sym = wepp_out[j+3].split('=')[1].split()[0].strip()
-                        sym = float(sym)
-                        
-                        break
-
-                for j in range(i0, iend):
-                    if 'OFF SITE EFFECTS' in wepp_out[j]:
-                        syp = wepp_out[j+3].split()[-2] # value in kg/m of width
-                        syp = float(syp)
-                        break
-                    
-                assert str(year) not in annuals, f"Year {year} already in dictionary"
-                
-                annuals[str(year)] = {
-                    'year': year,
-                    'storms': int(storms),
-                    'rainevents': int(rainevents),
-                    'snowevents': int(snowevents),
-                    'precip_mm': float(precip),
-                    'runoff_from_rain_mm': float(rro),
-                    'runoff_from_snow_mm': float(sro),
-                    'runoff_from_rain+snow_mm': float(rro) + float(sro),
-                    'soil_loss_mean_kg_m2': syr,
-                    'soil_loss_max_kg_m2': sym
-                }
+        # annuals are built as the years finish, the scanner keeps none of them
+        for year, values in scanner.scan(fp):
+            assert str(year) not in annuals, f"Year {year} already in dictionary"
+            annuals[str(year)] = {'year': year, **_soil_loss_summary(values, slope_length)}
                 
-                if  slope_length is None:
-                    annuals[str(year)]['sediment_yield_kg_m'] = syp
-                else:
-                    annuals[str(year)]['sediment_yield_kg_m2'] = syp / slope_length
-                
-            return_periods = {}
-            
-            if slope_length is not None and 'sediment_yield_kg_m' in return_period_measures:
-                return_period_measures.append('sediment_yield_kg_m2')
-                return_period_measures.remove('sediment_yield_kg_m')
-            
-            for measure in return_period_measures:
-                return_periods[measure] = calc_rec_intervals(annuals, measure, rec_intervals=rec_intervals)
-
-        for i, line in enumerate(wepp_out):
-            if 'ANNUAL AVERAGE SUMMARIES' in line:
-                wepp_out = wepp_out[i:]
-                break
-            
-        for i, line in enumerate(wepp_out):
-            if 'RAINFALL AND RUNOFF SUMMARY' in line:
-                storms = wepp_out[i+5].split()[0]
-                rainevents = wepp_out[i+6].split()[0]
-                snowevents = wepp_out[i+7].split()[0]
-                precip = wepp_out[i+14].split()[-2]
-                rro = wepp_out[i+15].split()[-2]
-                sro = wepp_out[i+17].split()[-2]
-                break
-
-        for i, line in enumerate(wepp_out):
-            if 'AREA OF NET SOIL LOSS' in line:
-                syr = wepp_out[i+2].split('=')[1].replace(' kg/m2 **', '').strip()
-                syr = float(syr)
-                
-                sym = wepp_out[i+3].split('=')[1].split()[0].strip()
-                sym = float(sym)
-                
-                area_of_net_loss = wepp_out[i+10][9:18].strip() # Area of Net Loss (m)
-                area_of_net_loss = float(area_of_net_loss)
-
-        for i, line in enumerate(wepp_out):
-            if 'OFF SITE EFFECTS' in line:
-                syp = wepp_out[i+4].split()[0] # in kg/m of width
-                syp = float(syp)
-                break
-            
-        annual_averages = {
-            'storms': int(storms),
-            'rainevents': int(rainevents),
-            'snowevents': int(snowevents),
-            'precip_mm': float(precip),
-            'runoff_from_rain_mm': float(rro),
-            'runoff_from_snow_mm': float(sro),
-            'runoff_from_rain+snow_mm': float(rro) + float(sro),
-            'soil_loss_mean_kg_m2': syr,
-            'soil_loss_max_kg_m2': sym
-        }
-            
-        if slope_length is None:
-            annual_averages['sediment_yield_kg_m'] = syp
-        else:
-            annual_averages['sediment_yield_kg_m2'] = syp / slope_length
-            
-        if road_width is not None:
-            road_length_exhibiting_soil_loss_m = area_of_net_loss
-            road_prism_erosion_kg = syr * road_width * road_length_exhibiting_soil_loss_m
-            sediment_leaving_buffer_kg = syp * road_width
+    values = scanner.annual_averages()
+    
+    if not scanner.detailed:
+        annuals = None
+    else:
+        # a new list, the caller's measures are left alone
+        measures = list(return_period_measures)
+        if slope_length is not None and 'sediment_yield_kg_m' in measures:
+            measures.remove('sediment_yield_kg_m')
+            measures.append('sediment_yield_kg_m2')
+        
+        return_periods = calc_return_periods(annuals, measures, rec_intervals)
             
-            annual_averages['sim_width_m'] = road_width
-            annual_averages['road_length_exhibiting_soil_loss_m'] = road_length_exhibiting_soil_loss_m
-            annual_averages['road_prism_erosion_kg'] = road_prism_erosion_kg
-            annual_averages['sediment_leaving_buffer_kg'] = sediment_leaving_buffer_kg
+    annual_averages = _soil_loss_summary(values, slope_length)
+        
+    if road_width is not None:
+        road_length_exhibiting_soil_loss_m = values['area_of_net_loss']
+        road_prism_erosion_kg = values['syr'] * road_width * road_length_exhibiting_soil_loss_m
+        sediment_leaving_buffer_kg = values['syp'] * road_width
+        
+        annual_averages['sim_width_m'] = road_width
+        annual_averages['road_length_exhibiting_soil_loss_m'] = road_length_exhibiting_soil_loss_m
+        annual_averages['road_prism_erosion_kg'] = road_prism_erosion_kg
+        annual_averages['sediment_leaving_buffer_kg'] = sediment_leaving_buffer_kg
 
     if annuals is None:
         return annual_averages
@@ -183,31 +310,95 @@ def parse_wepp_soil_output(
             }
         
         
-def _read_ebe_file(ebe_file):
+def _distribution(values) -> dict:
+    values = np.asarray(values, dtype=np.float64)
+    return {
+        'mean': float(np.mean(values)),
+        'std': float(np.std(values)),
+        'min': float(np.min(values)),
+        'p10': float(np.percentile(values, 10)),
+        'median': float(np.median(values)),
+        'p90': float(np.percentile(values, 90)),
+        'max': float(np.max(values))
+    }
+
+
+def summarize_ensemble(results: list) -> dict:
+    """
+    Distribution across climate realizations of the annual averages and
+    return-period values of ``parse_wepp_soil_output`` results.
+    """
+    if 'annual_averages' not in results[0]:
+        results = [{'annual_averages': r} for r in results]
+    
+    summary = {'annual_averages': {}}
+    for key, value in results[0]['annual_averages'].items():
+        if isinstance(value, (int, float)):
+            summary['annual_averages'][key] = _distribution(
+                [r['annual_averages'][key] for r in results])
+    
+    if results[0].get('return_periods') is not None:
+        summary['return_periods'] = {}
+        for measure, recs in results[0]['return_periods'].items():
+            summary['return_periods'][measure] = {
+                rec: _distribution([r['return_periods'][measure][rec][measure] for r in results])
+                for rec in recs
+            }
     
-    column_names = [
-        "day", "month", "year", "precip_mm", "runoff_mm", "ir_det_kg_m2", 
-        "av_det_kg_m2", "mx_det_kg_m2", "point_m", "av_dep_kg_m2", "max_dep_kg_m2", 
-        "point_dep_m", "sed_del_kg_m", "er"
-    ]
+    return summary
+
+
+def run_ensemble(run, parse, cli_fns: list) -> dict:
+    """
+    Run and parse a model once per climate realization, in parallel.
     
+    run(realization, cli_fn) returns the WEPP output file, parse(output_file)
+    its results. The runs share their slope, soil and management files, the
+    caller writes them before the fan-out.
+    """
+    realizations = len(cli_fns)
+    with ThreadPoolExecutor(max_workers=min(realizations, os.cpu_count() or 1)) as executor:
+        results = list(executor.map(lambda realization: parse(run(realization, cli_fns[realization])),
+                                    range(realizations)))
+    
+    return {
+        'ensemble': realizations,
+        'realizations': results,
+        'distribution': summarize_ensemble(results)
+    }
+
+
+_ebe_columns = [
+    "day", "month", "year", "precip_mm", "runoff_mm", "ir_det_kg_m2", 
+    "av_det_kg_m2", "mx_det_kg_m2", "point_m", "av_dep_kg_m2", "max_dep_kg_m2", 
+    "point_dep_m", "sed_del_kg_m", "er"
+]
+
+_ebe_numeric_columns = _ebe_columns[3:]
+
+# lines before the events
+_EBE_HEADER_LINES = 3
+
+# bump when the parsing of .ebe files changes, older caches are then ignored
+PARSE_VERSION = 1
+
+
+def _read_ebe_file_by_line(ebe_file):
+    # keeps the lines with exactly one field per column, anything that is
+    # not a number becomes NaN
     data = []
     with open(ebe_file, 'r') as file:
         lines = file.readlines()
-        for line in lines[3:]:
+        for line in lines[_EBE_HEADER_LINES:]:
             line = re.sub(r'\s+', ' ', line.strip())
             if line:
                 values = line.split(' ')
-                if len(values) == len(column_names):
+                if len(values) == len(_ebe_columns):
                     data.append(values)
     
-    df = pd.DataFrame(data, columns=column_names)
+    df = pd.DataFrame(data, columns=_ebe_columns)
     
-    numeric_columns = [
-        "precip_mm", "runoff_mm", "ir_det_kg_m2", "av_det_kg_m2", "mx_det_kg_m2", 
-        "point_m", "av_dep_kg_m2", "max_dep_kg_m2", "point_dep_m", "sed_del_kg_m", "er"
-    ]
-    df[numeric_columns] = df[numeric_columns].apply(pd.to_numeric, errors='coerce')
+    df[_ebe_numeric_columns] = df[_ebe_numeric_columns].apply(pd.to_numeric, errors='coerce')
     df["day"] = df["day"].astype(int)
     df["month"] = df["month"].astype(int)
     df["year"] = df["year"].astype(int)
@@ -215,17 +406,76 @@ def _read_ebe_file(ebe_file):
     return df
 
 
-def get_annual_maxima_events_from_ebe(ebe_file, cli_file=None):
-    climate = None
-    if cli_file is not None:
-        climate = ClimateFile(cli_file)
+def parsed_path(ebe_file: str) -> str:
+    return f'{ebe_file}.parsed.v{PARSE_VERSION}.npy'
+
+
+def _read_ebe_file(ebe_file, use_cache: bool = False):
+    """
+    Events of a WEPP event by event output file.
+
+    With ``use_cache`` the events are saved next to the file as a structured
+    ``.parsed.v<PARSE_VERSION>.npy`` and later reads memory-map it instead of
+    parsing text. The cache is ignored when it is older than the file, WEPP
+    rewrites the output on every run, or when it was written by another
+    parser version.
+    """
+    npy_fn = parsed_path(ebe_file)
+    
+    if use_cache and _exists(npy_fn) and \
+            os.stat(npy_fn).st_mtime_ns >= os.stat(ebe_file).st_mtime_ns:
+        events = np.load(npy_fn, mmap_mode='r')
+        if events.dtype.names == tuple(_ebe_columns):
+            return pd.DataFrame({col: events[col] for col in _ebe_columns})
+    
+    df = _parse_ebe_file(ebe_file)
+    
+    if use_cache and all(df[col].dtype.kind in 'if' for col in _ebe_columns):
+        tmp_fn = f'{npy_fn}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_fn, 'wb') as fp:
+                np.save(fp, df.to_records(index=False))
+            os.replace(tmp_fn, npy_fn)
+        except OSError:
+            if _exists(tmp_fn):
+                os.remove(tmp_fn)
+    
+    return df
+
+
+def _parse_ebe_file(ebe_file):
+    """
+    Events of a WEPP event by event output file.
+
+    The file is parsed by the pandas C reader straight into typed columns,
+    which infers int64 or float64 per column like ``pd.to_numeric`` and
+    rounds floats the same way. Files with lines that are not 14 numbers
+    (extra headers, truncated rows, ``*****`` overflows) are read line by
+    line instead, which skips or coerces those lines as before.
+    """
+    try:
+        df = pd.read_csv(ebe_file, sep=r'\s+', skiprows=_EBE_HEADER_LINES, header=None,
+                         names=_ebe_columns, engine='c')
+    except ValueError:
+        # ParserError (a line with too many fields) and EmptyDataError
+        return _read_ebe_file_by_line(ebe_file)
     
-    df = _read_ebe_file(ebe_file)
+    # short lines are padded with NaN, fields that are not numbers leave an object column
+    if (any(df[col].dtype.kind not in 'if' for col in _ebe_numeric_columns) or
+            any(df[col].dtype.kind != 'i' for col in ('day', 'month', 'year')) or
+            df.isna().values.any()):
+        return _read_ebe_file_by_line(ebe_file)
+    
+    return df
+
+
+def get_annual_maxima_events_from_ebe(ebe_file, cli_file=None, use_cache: bool = False):
+    df = _read_ebe_file(ebe_file, use_cache)
     
     largest_runoff_events = df.loc[df.groupby("year")["runoff_mm"].idxmax()]
     
-    if climate is not None:
-        cli_df = climate.as_dataframe(calc_peak_intensities=True)
+    if cli_file is not None:
+        cli_df = load_peak_intensities(cli_file)
         largest_runoff_events = largest_runoff_events.merge(
             cli_df[['da', 'mo', 'year', '10-min Peak Rainfall Intensity (mm/hour)', 
                 '30-min Peak Rainfall Intensity (mm/hour)', 
@@ -246,14 +496,67 @@ def get_annual_maxima_events_from_ebe(ebe_file, cli_file=None):
         'num_years_with_runoff_event': len(year_ranks)}
     
     
-def get_selected_events_from_ebe(ebe_file, selected_dates: list):
-    df = _read_ebe_file(ebe_file)
-    
-    selected_events = []
-    for date in selected_dates:
-        day, month, year = date['day'], date['month'], date['year']
-        day, month, year = int(day), int(month), int(year)
-        selected_event = df[(df['day'] == day) & (df['month'] == month) & (df['year'] == year)]
-        selected_events.extend(selected_event.to_dict(orient='records'))
-    
-    return selected_events
+def pack_dates(day, month, year) -> np.ndarray:
+    """
+    Dates as year * 10000 + month * 100 + day, which sort chronologically.
+    """
+    return (np.asarray(year, dtype=np.int64) * 10000 +
+            np.asarray(month, dtype=np.int64) * 100 +
+            np.asarray(day, dtype=np.int64))
+
+
+class EbeEventTable:
+    """
+    Events of a .ebe file as columns sorted by packed date (file order is
+    kept within a date). The events of any number of dates are found with
+    two ``searchsorted`` calls instead of a mask over the table per date.
+    """
+    def __init__(self, df: pd.DataFrame):
+        dates = pack_dates(df['day'].values, df['month'].values, df['year'].values)
+        order = np.argsort(dates, kind='stable')
+        
+        self.dates = dates[order]
+        self.columns = {col: df[col].values[order] for col in df.columns}
+
+    @classmethod
+    def read(cls, ebe_file):
+        return cls(_read_ebe_file(ebe_file))
+
+    def __len__(self):
+        return len(self.dates)
+
+    def rows(self, dates) -> np.ndarray:
+        """
+        Row indices of the events on each of the packed ``dates``, in the
+        order of ``dates``.
+        """
+        dates = np.asarray(dates, dtype=np.int64)
+        lo = np.searchsorted(self.dates, dates, side='left')
+        counts = np.searchsorted(self.dates, dates, side='right') - lo
+        
+        # lo[i], lo[i] + 1, ..., lo[i] + counts[i] - 1 for each date
+        starts = np.cumsum(counts) - counts
+        return np.repeat(lo - starts, counts) + np.arange(counts.sum())
+
+    def select(self, selected_dates: list) -> dict:
+        """
+        Columns of the events on ``selected_dates`` (dicts with day, month
+        and year), in the order of the dates.
+        """
+        dates = pack_dates([int(d['day']) for d in selected_dates],
+                           [int(d['month']) for d in selected_dates],
+                           [int(d['year']) for d in selected_dates])
+        rows = self.rows(dates)
+        return {col: values[rows] for col, values in self.columns.items()}
+
+
+def records(columns: dict) -> list:
+    """
+    Rows of columnar arrays as dicts of native Python values.
+    """
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*(columns[name].tolist() for name in names))]
+
+
+def get_selected_events_from_ebe(ebe_file, selected_dates: list) -> dict:
+    return EbeEventTable.read(ebe_file).select(selected_dates)
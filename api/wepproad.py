@@ -12,10 +12,12 @@ from fastapi import APIRouter, Query, Response, Request, HTTPException, Body
 from typing import Optional
 from pydantic import BaseModel
 
-from .rockclim import ClimatePars
+from .rockclim import ClimatePars, get_climates
 from .shared_models import SoilTexture
-from .wepp import parse_wepp_soil_output
-from .logger import log_run
+from .wepp import parse_wepp_soil_output, run_ensemble
+from .logger import log_run, log_climate
+from .http_cache import file_response
+from . import build_static
 
 router = APIRouter()
 
@@ -318,11 +320,12 @@ def create_slope_file(state: WeppRoadState):
     return slope_file
 
 
-def run_wepproad(state: WeppRoadState):
-    
-    import subprocess
-    from .rockclim import get_climate
-    
+def create_input_files(state: WeppRoadState):
+    """
+    Writes the slope, soil and management files to the run directory and
+    returns their names. Ensemble runs share them, so they are written
+    once before the realizations start.
+    """
     cwd = '/ramdisk/wepproad'
     
     slope_fn = create_slope_file(state)
@@ -336,9 +339,26 @@ def run_wepproad(state: WeppRoadState):
     
     shutil.copyfile(man_fn, _join(cwd, f'{_man_fn}'))
     
-    cli_fn = get_climate(state.climate)
+    return _slope_fn, _soil_fn, _man_fn
+
+
+def run_wepproad(state: WeppRoadState, realization: int = 0, cli_fn: str = None, input_files=None):
+    
+    import subprocess
+    from .rockclim import get_climate
+    
+    cwd = '/ramdisk/wepproad'
+    
+    if input_files is None:
+        input_files = create_input_files(state)
+    _slope_fn, _soil_fn, _man_fn = input_files
+    
+    if cli_fn is None:
+        cli_fn = get_climate(state.climate, realization)
     
     _hash = hash(state)
+    if realization:
+        _hash = f'{_hash}.r{realization}'
     run_fn = _join(cwd, f'wr_{_hash}.run')
     output_fn = _join(cwd, f'wr_{_hash}.dat')
     _output_fn = _split(output_fn)[1]
@@ -431,15 +451,14 @@ example_pars = {
 }
 
 @router.post("/wepproad/GET/soil")
-def wepproad_get_soil(state: WeppRoadState = Body(
+def wepproad_get_soil(request: Request, state: WeppRoadState = Body(
         ...,
         example=example_pars
     )
 ):
     try:
         soil_file_path = create_soil_file(state)
-        contents = open(soil_file_path).read()
-        return Response(content=contents, media_type="application/text")
+        return file_response(request, soil_file_path)
     except ValueError as e:
         return {"error": str(e)}
     except FileNotFoundError as e:
@@ -447,15 +466,16 @@ def wepproad_get_soil(state: WeppRoadState = Body(
     
 
 @router.post("/wepproad/GET/management")
-def wepproad_get_management(state: WeppRoadState = Body(
+def wepproad_get_management(request: Request, state: WeppRoadState = Body(
         ...,
         example=example_pars
     )
 ):
     try:
         man_file_path = get_management_file(state)
-        contents = open(man_file_path).read()
-        return Response(content=contents, media_type="application/text")
+        # the prebuilt copy has a .gz sibling, nothing is written next to the template
+        static_path = build_static.static_path(f'wepproad/managements/{_split(man_file_path)[1]}')
+        return file_response(request, static_path or man_file_path)
     except ValueError as e:
         return {"error": str(e)}
     except FileNotFoundError as e:
@@ -463,15 +483,14 @@ def wepproad_get_management(state: WeppRoadState = Body(
     
     
 @router.post("/wepproad/GET/slope")
-def wepproad_get_slope(state: WeppRoadState = Body(
+def wepproad_get_slope(request: Request, state: WeppRoadState = Body(
         ...,
         example=example_pars
     )
 ):
     try:
         slope_file = create_slope_file(state)
-        contents = open(slope_file).read()
-        return Response(content=contents, media_type="application/text")
+        return file_response(request, slope_file)
     except ValueError as e:
         return {"error": str(e)}
     except FileNotFoundError as e:
@@ -486,19 +505,30 @@ def wepproad_run_wepp_road(
         example=example_pars
     )
 ):
-    output_fn = run_wepproad(state)
+    road_width = state.wepproad_pars.road.sim_width_m
+    
+    if state.climate.ensemble > 1:
+        input_files = create_input_files(state)
+        results = run_ensemble(
+            lambda realization, cli_fn: run_wepproad(state, realization, cli_fn, input_files),
+            lambda output_fn: parse_wepp_soil_output(output_fn, road_width=road_width),
+            get_climates(state.climate))
+    else:
+        output_fn = run_wepproad(state)
+        results = parse_wepp_soil_output(output_fn, road_width=road_width)
+    
     log_run(ip=request.client.host, model="wepproad")
-    return parse_wepp_soil_output(output_fn, road_width=state.wepproad_pars.road.sim_width_m)
+    log_climate(model="wepproad", climate=state.climate)
+    return results
 
 
 @router.post("/wepproad/GET/wepp_output")
-def wepproad_get_wepp_output(state: WeppRoadState = Body(
+def wepproad_get_wepp_output(request: Request, state: WeppRoadState = Body(
         ...,
         example=example_pars
     )
 ):
     output_fn = run_wepproad(state)
-    contents = open(output_fn).read()
-    return Response(content=contents, media_type="application/text")
+    return file_response(request, output_fn)
     
 
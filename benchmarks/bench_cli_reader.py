@@ -0,0 +1,112 @@
+"""
+Benchmark the NumPy CLIGEN reader against wepppy2's ClimateFile.
+
+    python -m benchmarks.bench_cli_reader [climate.cli ...]
+
+Without arguments synthetic 100- and 1000-year climates in CLIGEN 5.3
+format are written to a temporary directory and benchmarked.
+"""
+import os
+from os.path import join as _join
+
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+from api.cli_reader import read_cli, daily_path
+
+_header = """5.32300
+   1   0   0
+   Station:  SYNTHETIC BENCHMARK STATION                     CLIGEN VER. 5.32300 -r:    0 -I: 2
+ Latitude Longitude Elevation (m) Obs. Years   Beginning year  Years simulated Command Line:
+    46.73  -116.97         802          40           1         {years:5d}   -isynthetic.par -y{years}
+ Observed monthly ave max temperature (C)
+   1.6   5.1   9.6  14.1  18.8  23.6  29.2  29.3  23.8  16.4   7.3   2.4
+ Observed monthly ave min temperature (C)
+  -5.3  -3.3  -1.3   1.0   4.0   7.1   8.9   8.4   5.3   1.3  -2.0  -4.3
+ Observed monthly ave solar radiation (Langleys/day)
+ 144.0 225.0 327.0 428.0 516.0 580.0 653.0 570.0 437.0 285.0 162.0 118.0
+ Observed monthly ave precipitation (mm)
+  71.1  54.6  55.9  44.5  45.7  37.3  16.3  19.8  23.4  41.1  66.8  70.1
+   da mo year  prcp  dur   tp     ip  tmax  tmin  rad  w-vl w-dir  tdew
+              (mm)  (h)               (C)   (C) (l/d) (m/s)(Deg)   (C)
+"""
+
+_days_in_month = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def write_synthetic_climate(cli_fn: str, years: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    with open(cli_fn, 'w') as fp:
+        fp.write(_header.format(years=years))
+        for year in range(1, years + 1):
+            for mo, n_days in enumerate(_days_in_month, start=1):
+                for da in range(1, n_days + 1):
+                    wet = rng.random() < 0.3
+                    prcp = rng.gamma(0.8, 8.0) if wet else 0.0
+                    dur = rng.uniform(0.5, 12.0) if wet else 0.0
+                    tp = rng.uniform(0.0, 1.0) if wet else 0.0
+                    ip = rng.uniform(1.0, 8.0) if wet else 0.0
+                    tmax = rng.normal(15.0, 10.0)
+                    tmin = tmax - rng.uniform(5.0, 15.0)
+                    fp.write(f" {da:4d}{mo:3d}{year:5d}{prcp:6.1f}{dur:6.2f}{tp:5.2f}{ip:7.2f}"
+                             f"{tmax:6.1f}{tmin:6.1f}{rng.uniform(50, 700):5.0f}"
+                             f"{rng.uniform(0, 12):5.1f}{rng.uniform(0, 360):6.0f}{tmin - 1.0:6.1f}\n")
+
+
+def _timeit(func, repeat: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench(cli_fn: str):
+    def _remove_cache():
+        if os.path.exists(daily_path(cli_fn)):
+            os.remove(daily_path(cli_fn))
+
+    def _parse():
+        _remove_cache()
+        read_cli(cli_fn, use_cache=False)
+
+    def _cached():
+        np.asarray(read_cli(cli_fn)['prcp']).sum()
+
+    results = {'numpy parse': _timeit(_parse)}
+
+    read_cli(cli_fn)
+    results['numpy cached (mmap)'] = _timeit(_cached)
+    _remove_cache()
+
+    try:
+        from wepppy2.climates.cligen import ClimateFile
+        results['ClimateFile'] = _timeit(lambda: ClimateFile(cli_fn), repeat=3)
+    except ImportError:
+        results['ClimateFile'] = None
+
+    n_days = len(read_cli(cli_fn, use_cache=False))
+    print(f'{cli_fn} ({n_days} days)')
+    for name, seconds in results.items():
+        if seconds is None:
+            print(f'  {name:22s}  n/a (wepppy2 not installed)')
+        else:
+            print(f'  {name:22s} {seconds * 1000.0:10.2f} ms')
+
+
+if __name__ == "__main__":
+    cli_fns = sys.argv[1:]
+
+    if cli_fns:
+        for cli_fn in cli_fns:
+            bench(cli_fn)
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for years in (100, 1000):
+                cli_fn = _join(tmp_dir, f'synthetic_{years}y.cli')
+                write_synthetic_climate(cli_fn, years)
+                bench(cli_fn)
@@ -44,6 +44,39 @@ const MARKER_ICONS = {
 // Helper function to create Leaflet icons
 const createIcon = (iconConfig) => L.icon(iconConfig);
 
+// Helper function to create the count badge used for station clusters
+const createClusterIcon = (count) =>
+  L.divIcon({
+    html: `<div style="display:flex;align-items:center;justify-content:center;width:36px;height:36px;border-radius:9999px;background:rgba(22,101,52,0.85);color:white;font-size:12px;font-weight:600;border:2px solid white;">${count}</div>`,
+    className: "",
+    iconSize: [36, 36],
+    iconAnchor: [18, 18],
+    popupAnchor: [0, -18],
+  });
+
+// Returns the [x, y] indices of the slippy map tiles covering the bounding box at the zoom level.
+const tilesForBbox = (bbox, zoom) => {
+  const z = Math.max(0, Math.min(18, Math.round(zoom)));
+  const n = 2 ** z;
+  const clampIndex = (i) => Math.min(n - 1, Math.max(0, i));
+  const lonToX = (lon) => clampIndex(Math.floor(((lon + 180) / 360) * n));
+  const latToY = (lat) => {
+    const rad = (Math.max(-85.0511, Math.min(85.0511, lat)) * Math.PI) / 180;
+    return clampIndex(
+      Math.floor(((1 - Math.log(Math.tan(rad) + 1 / Math.cos(rad)) / Math.PI) / 2) * n),
+    );
+  };
+
+  const [west, north, east, south] = bbox;
+  const tiles = [];
+  for (let x = lonToX(west); x <= lonToX(east); x++) {
+    for (let y = latToY(north); y <= latToY(south); y++) {
+      tiles.push([x, y]);
+    }
+  }
+  return { z, tiles };
+};
+
 // Defines the location marker on the map based on the user's click.
 const LocationMarker = memo(
   ({ previewCoordinates, setPreviewCoordinates, setLatInput, setLngInput }) => {
@@ -71,27 +104,50 @@ const LocationMarker = memo(
   },
 );
 
-// Defines the station markers on the map visible when zoomed in.
+// Defines the station markers on the map. At low zoom levels the server returns
+// clusters of stations, which are drawn as a count badge instead of a station marker.
 const StationMarkers = memo(
   ({ stations }) => {
-    const stationsList = stations.map((station) => (
-      <Marker
-        key={station.properties.id}
-        position={[
-          station.geometry.coordinates[1],
-          station.geometry.coordinates[0],
-        ]}
-        icon={createIcon(MARKER_ICONS.station)}
-      >
-        <Popup>
-          <div>
-            <strong>{station.properties.desc}</strong>
-            <br />
-            ID: {station.properties.id}
-          </div>
-        </Popup>
-      </Marker>
-    ));
+    const stationsList = stations.map((station) => {
+      const position = [
+        station.geometry.coordinates[1],
+        station.geometry.coordinates[0],
+      ];
+
+      if (station.properties.cluster) {
+        return (
+          <Marker
+            key={`cluster-${position[0]}-${position[1]}`}
+            position={position}
+            icon={createClusterIcon(station.properties.point_count)}
+          >
+            <Popup>
+              <div>
+                <strong>{station.properties.point_count} stations</strong>
+                <br />
+                Zoom in to see individual stations.
+              </div>
+            </Popup>
+          </Marker>
+        );
+      }
+
+      return (
+        <Marker
+          key={station.properties.id}
+          position={position}
+          icon={createIcon(MARKER_ICONS.station)}
+        >
+          <Popup>
+            <div>
+              <strong>{station.properties.desc}</strong>
+              <br />
+              ID: {station.properties.id}
+            </div>
+          </Popup>
+        </Marker>
+      );
+    });
 
     return (
       <LayerGroup>{stationsList}</LayerGroup>
@@ -153,7 +209,7 @@ const MapBBoxHandler = ({
       JSON.stringify(bbox) !== JSON.stringify(prevBboxRef.current)
     ) {
       prevBboxRef.current = bbox;
-      fetchStations(bbox);
+      fetchStations(bbox, zoom);
     } else if (zoom < minZoomLevel) {
       setStations([]);
     }
@@ -228,8 +284,8 @@ function ChooseLocation({
   }, [bbox]);
 
   // minZoomLevel: The minimum zoom level to display the stations on the map.
-  // Caution: If the zoom level is lower than 5-7, then ~100+ stations will be fetched and it will be slow.
-  const minZoomLevel = 7;
+  // Below zoom 7 the station tiles are clustered server-side, so they stay small.
+  const minZoomLevel = 3;
 
   // prevBboxRef: Reference to the previous bounding box.
   const prevBboxRef = useRef(bbox);
@@ -249,18 +305,33 @@ function ChooseLocation({
   //   sessionStorage.setItem("databaseVersion", databaseVersion);
   // }, [databaseVersion]);
 
-  // Fetch stations based on the bounding box.
-  const fetchStations = async (bbox) => {
+  // Fetch stations based on the bounding box. Stations are fetched as z/x/y tiles,
+  // which the browser caches, so panning back over an area does not refetch it.
+  const fetchStations = async (bbox, zoom) => {
     try {
-      // API call
-      const response = await api.post("/api/rockclim/GET/stations_geojson", {
-        // Database version is None if the user has not selected any database.
-        database: databaseVersion === "None" ? null : databaseVersion,
-        bbox: bbox,
+      // Database version is None if the user has not selected any database.
+      const database = databaseVersion === "None" || !databaseVersion ? "legacy" : databaseVersion;
+      const { z, tiles } = tilesForBbox(bbox, zoom);
+      // API calls
+      const responses = await Promise.all(
+        tiles.map(([x, y]) =>
+          api.get(`/api/rockclim/GET/stations_tile/${database}/${z}/${x}/${y}`),
+        ),
+      );
+
+      // Stations on a tile edge are returned by both tiles
+      const features = new Map();
+      responses.forEach((response) => {
+        response.data.features.forEach((feature) => {
+          const key = feature.properties.cluster
+            ? `cluster-${feature.geometry.coordinates.join(",")}`
+            : feature.properties.id;
+          features.set(key, feature);
+        });
       });
-      setStations([]); // Clear previous stations before setting new ones
+
       // Set returned stations
-      setStations(response.data.features);
+      setStations(Array.from(features.values()));
     } catch (error) {
       console.error("Error fetching stations:", error);
     }
@@ -241,10 +241,11 @@ const RockCliMe = () => {
     const fetchRegionData = async () => {
       setIsLoadingRegions(true);
       try {
-        const response = await api.post(
+        // GET so the browser can reuse the cached (ETag) response
+        const response = await api.get(
           "/api/rockclim/GET/available_state_codes",
           {
-            database: databaseVersion, // Use actual database version
+            params: { database: databaseVersion }, // Use actual database version
           },
         );
 
@@ -287,8 +288,8 @@ const RockCliMe = () => {
       setIsLoadingStations(true); // Add loading state
 
       try {
-        const response = await api.post("/api/rockclim/GET/stations_in_state", {
-          state_code: selectedRegion,
+        const response = await api.get("/api/rockclim/GET/stations_in_state", {
+          params: { state_code: selectedRegion },
         });
         setClosestStations(response.data);
         setSelectedStation(null); // Clear selected station when data changes
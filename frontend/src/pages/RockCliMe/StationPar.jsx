@@ -247,14 +247,16 @@ function StationPar() {
     const fetchStationData = async () => {
       try {
         // API Call
-        const response = await api.post(
+        const response = await api.get(
           "/api/rockclim/GET/station_par_monthlies",
           {
-            database: databaseVersion,
-            cligen_version: cligenVersion,
-            par_id: par_id,
-            location: location,
-            use_prism: usePrismPar,
+            params: {
+              database: databaseVersion,
+              par_id: par_id,
+              longitude: location?.longitude,
+              latitude: location?.latitude,
+              use_prism: usePrismPar,
+            },
           },
         );
         setParData(response.data);
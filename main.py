@@ -7,6 +7,8 @@ from api.disturbed import router as disturbed_router
 from api.ermit import router as ermit_router
 from api.rockclim import router as rockclim_router
 from api.logger import router as logger_router
+from api import station_registry
+from api import prewarm
 
 import traceback
 import uuid
@@ -26,6 +28,18 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
+@app.on_event("startup")
+def preload_station_registries():
+    # compile (once per host) and memory-map the station databases
+    station_registry.preload()
+
+
+@app.on_event("startup")
+def load_climate_pack():
+    # pregenerated climates for the most used stations, see api/prewarm.py
+    prewarm.load_pack()
+
+
 @app.middleware("http")
 async def ensure_user_id_middleware(request: Request, call_next):
     response: Response = await call_next(request)
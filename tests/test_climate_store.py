@@ -0,0 +1,41 @@
+import pytest
+
+from api.climate_store import _set_years_simulated
+
+header_53 = b'''5.32300
+   1   0   0
+   Station:  MOSCOW U OF I ID                               CLIGEN VER. 5.32300 -r:    0 -I: 2
+ Latitude Longitude Elevation (m) Obs. Years   Beginning year  Years simulated Command Line:
+    46.73  -116.97         802          40           1           100   -iid106152.par -y100
+ Observed monthly ave max temperature (C)
+'''
+
+header_43 = b''' 4.30
+   1   0   0
+   Station:  MOSCOW U OF I ID                               CLIGEN VER. 4.30 -r:    0 -I: 0
+ Latitude Longitude Elevation (m) Obs. Years   Beginning year  Years simulated
+    46.73  -116.97         802          40           1           100
+ Observed monthly ave max temperature (C)
+'''
+
+
+def _values(header):
+    return header.split(b'\n')[4].split()
+
+
+def test_years_simulated_53_header():
+    values = _values(_set_years_simulated(header_53, 20))
+    assert values[5] == b'20'
+    assert values[-1] == b'-y20'
+
+
+def test_years_simulated_43_header():
+    values = _values(_set_years_simulated(header_43, 20))
+    assert values == [b'46.73', b'-116.97', b'802', b'40', b'1', b'20']
+
+
+def test_years_simulated_unrecognized_header():
+    with pytest.raises(ValueError):
+        _set_years_simulated(header_43.replace(b'Years simulated', b'Years'), 20)
+    with pytest.raises(ValueError):
+        _set_years_simulated(header_43.replace(b'           1           100', b''), 20)
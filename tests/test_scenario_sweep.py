@@ -0,0 +1,43 @@
+import pytest
+from pydantic import ValidationError
+
+from api.rockclim import ScenarioSweepRequest, scenario_par_mod
+
+base = {
+    'ppts': [100.0 + i for i in range(12)],
+    'tmaxs': [5.0 + i for i in range(12)],
+    'tmins': [-5.0 + i for i in range(12)],
+}
+
+
+def test_temperature_delta_is_added_in_degrees_c():
+    mod = scenario_par_mod(base, 1.0, 4.0)
+    assert [t - b for t, b in zip(mod.tmaxs, base['tmaxs'])] == pytest.approx([4.0] * 12)
+    assert [t - b for t, b in zip(mod.tmins, base['tmins'])] == pytest.approx([4.0] * 12)
+    assert mod.ppts == pytest.approx(base['ppts'])
+
+
+def test_precipitation_multiplier():
+    mod = scenario_par_mod(base, 1.2, 0.0)
+    assert mod.ppts == pytest.approx([v * 1.2 for v in base['ppts']])
+    assert mod.tmaxs == pytest.approx(base['tmaxs'])
+
+
+def test_monthly_deltas():
+    ppt = [1.0] * 6 + [0.5] * 6
+    temp = [float(i) for i in range(12)]
+    mod = scenario_par_mod(base, ppt, temp)
+    assert mod.ppts == pytest.approx([v * m for v, m in zip(base['ppts'], ppt)])
+    assert mod.tmaxs == pytest.approx([v + dt for v, dt in zip(base['tmaxs'], temp)])
+
+
+def test_request_validation():
+    climate = {'par_id': 'WA459074'}
+    ScenarioSweepRequest(climate=climate, ppt_multipliers=[0.9, [1.0] * 12], temp_deltas_c=[[2.0] * 12])
+
+    with pytest.raises(ValidationError):
+        ScenarioSweepRequest(climate=climate, temp_deltas_c=[[2.0] * 11])
+    with pytest.raises(ValidationError):
+        ScenarioSweepRequest(climate=climate, ppt_multipliers=[[1.0] * 11 + [-1.0]])
+    with pytest.raises(ValidationError):
+        ScenarioSweepRequest(climate=climate, ppt_multipliers=[0.0])